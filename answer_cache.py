@@ -0,0 +1,89 @@
+"""
+Persistent cache of final answers to the app's preset questions.
+
+The preset questions produce the same answer until the files behind them
+change, so their answers are stored in SQLite, one row per normalized
+question, together with a fingerprint of the inputs the answer was built
+from (framework, patient data and guideline files, by content hash and
+modifiedTime). A lookup whose inputs differ from the stored ones is a miss
+and drops the stale row, so edited or added files invalidate answers without
+any explicit bookkeeping.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+ANSWER_CACHE_PATH = os.environ.get("ANSWER_CACHE_PATH", ".answer_cache.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    query TEXT PRIMARY KEY,
+    inputs TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+"""
+
+
+def inputs_digest(parts):
+    """Stable hash of the input fingerprints an answer depends on."""
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """Normalized question -> answer, valid only for the inputs it was built from."""
+
+    def __init__(self, path=ANSWER_CACHE_PATH):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+
+    def get(self, query, inputs):
+        """Returns the cached answer for these inputs, or None (dropping a stale one)."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT inputs, answer FROM answers WHERE query = ?", (query,)
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            if row[0] != inputs:
+                with self._db:
+                    self._db.execute("DELETE FROM answers WHERE query = ?", (query,))
+                print(f"🗑️ Answer cache: inputs changed, dropped answer for: {query}")
+                return None
+
+        print(f"⚡ Answer cache hit for: {query}")
+        return row[1]
+
+    def put(self, query, inputs, answer):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO answers (query, inputs, answer, created_at) VALUES (?, ?, ?, ?)",
+                (query, inputs, answer, time.time()),
+            )
+
+    def invalidate(self, query):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM answers WHERE query = ?", (query,))
+
+    def clear(self):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM answers")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_answer_cache():
+    global _cache
+
+    with _cache_lock:
+        if _cache is None:
+            _cache = AnswerCache()
+
+    return _cache
@@ -679,8 +679,11 @@
 # """, unsafe_allow_html=True)
 
 import streamlit as st
-from drive_manager import list_data_files
-from workflow import generate_response
+from drive_sync import get_drive_sync
+from jobs import job_executor
+from warmup import get_warmup_scheduler
+from workflow import PRESET_QUESTIONS
+import uuid
 
 # --- Streamlit Configuration ---
 st.set_page_config(page_title="Health Tutor Console", layout="wide")
@@ -691,11 +694,26 @@ if "sessions" not in st.session_state:
     st.session_state.sessions = {"Session 1": []}
 if "current_session" not in st.session_state:
     st.session_state.current_session = "Session 1"
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+if "pending_jobs" not in st.session_state:
+    st.session_state.pending_jobs = []
+
+# Re-answers the preset questions in the background whenever patient data changes
+get_warmup_scheduler()
 
 # --- Sidebar: Document Management (Read-Only) ---
 st.sidebar.header("📂 Current Document Context")
 
-files = list_data_files()
+# Served from a process-wide cache over the background-synced index, keyed
+# on the index version: uploads, deletes and synced changes bump the version
+# (invalidating the entry), and reruns in between cost no I/O at all.
+@st.cache_data(ttl=300, show_spinner=False)
+def load_document_inventory(index_version):
+    return get_drive_sync().list_files()
+
+
+files = load_document_inventory(get_drive_sync().version)
 
 if not files:
     st.sidebar.info("No documents found in the shared folder yet.")
@@ -720,12 +738,7 @@ for message in active_messages:
 # 2️⃣ QUICK QUESTIONS (always ABOVE chat input)
 st.markdown("### Quick Questions")
 
-preset_questions = [
-    "Prepare me for my doctor's visit",
-    "What's my health summary?",
-    "What should I ask my doctor?",
-    "Summarize my recent metrics",
-]
+preset_questions = PRESET_QUESTIONS
 
 cols = st.columns(len(preset_questions))
 
@@ -737,6 +750,9 @@ for i, q in enumerate(preset_questions):
         st.session_state.preset_query = q
         st.rerun()
 
+# Preset answers are reused until the underlying files change
+force_refresh = st.checkbox("🔄 Regenerate answers instead of reusing saved ones")
+
 
 # 3️⃣ CHAT INPUT (always at the bottom)
 chat_input = st.chat_input("Enter your medical question:")
@@ -751,18 +767,50 @@ elif chat_input:
 
 
 # 4️⃣ PROCESS QUERY
+# The pipeline runs as a background job; this script run returns right away
+# and the answer streams in through the fragment below. Reruns (clicks, new
+# questions) pick the same job back up instead of starting it again.
 if query:
     active_messages.append({"role": "user", "content": query})
 
     with st.chat_message("user"):
         st.markdown(query)
 
-    with st.chat_message("assistant"):
-        with st.spinner("Claude is thinking..."):
-            answer = generate_response(query)
+    job = job_executor.submit(st.session_state.session_id, query, force=force_refresh)
+    if job.id not in st.session_state.pending_jobs:
+        st.session_state.pending_jobs.append(job.id)
+
+
+@st.fragment(run_every=0.5)
+def show_pending_answers():
+    finished = False
 
-        st.markdown(answer)
+    for job_id in list(st.session_state.pending_jobs):
+        job = job_executor.get(st.session_state.session_id, job_id)
+        if job is None:
+            st.session_state.pending_jobs.remove(job_id)
+            continue
+
+        if job.done:
+            job_executor.collect(st.session_state.session_id, job_id)
+            st.session_state.pending_jobs.remove(job_id)
+
+            answer = job.text if not job.error else f"⚠️ Sorry, something went wrong: {job.error}"
+            st.session_state.sessions[st.session_state.current_session].append(
+                {"role": "assistant", "content": answer}
+            )
+            finished = True
+            continue
+
+        with st.chat_message("assistant"):
+            if job.chunks:
+                st.markdown(job.text)
+            st.caption(f"⏳ {job.stage}")
+
+    # Full rerun so finished answers move into the chat history above
+    if finished:
+        st.rerun()
 
-    active_messages.append({"role": "assistant", "content": answer})
-    st.session_state.sessions[st.session_state.current_session] = active_messages
 
+if st.session_state.pending_jobs:
+    show_pending_answers()
@@ -0,0 +1,107 @@
+"""
+Token-budgeted assembly of the prompt context.
+
+Each section of the final prompt (framework, patient data, guidelines) gets
+its own token budget, and all sections together share a ceiling. Sections
+are filled in order; within a section, items are taken in priority order
+(newest patient file first, best-scoring guideline passage first) and the
+item that crosses the budget is truncated, with the rest dropped. Text is
+built with list joins rather than repeated string concatenation.
+
+Tokens are estimated locally (~4 characters per token for English text),
+which keeps assembly free of network calls.
+"""
+import os
+
+CHARS_PER_TOKEN = 4
+
+CONTEXT_MAX_TOKENS = int(os.environ.get("CONTEXT_MAX_TOKENS", 120_000))
+
+SECTION_BUDGETS = {
+    "framework": 20_000,
+    "patient_data": 40_000,
+    "guidelines": 60_000,
+}
+
+# Don't bother keeping a truncated tail shorter than this
+MIN_PARTIAL_TOKENS = 200
+
+TRUNCATION_MARKER = "\n[... truncated to fit the context budget ...]"
+
+
+def estimate_tokens(text):
+    """Rough token count for budgeting purposes."""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cuts text to about max_tokens, preferring a line or word boundary."""
+    limit = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+
+    cut = text.rfind("\n", 0, limit)
+    if cut < limit // 2:
+        cut = text.rfind(" ", 0, limit)
+    if cut < limit // 2:
+        cut = limit
+    return text[:cut]
+
+
+def fit_items(items, budget):
+    """
+    Joins (header, text) items, in priority order, within `budget` tokens.
+    Returns the joined text and the number of tokens used.
+    """
+    parts = []
+    used = 0
+    dropped = 0
+
+    for i, (header, text) in enumerate(items):
+        remaining = budget - used
+        cost = estimate_tokens(header) + estimate_tokens(text)
+
+        if cost <= remaining:
+            parts.append(header)
+            parts.append(text)
+            used += cost
+            continue
+
+        # This item crosses the budget: keep a truncated copy if there's
+        # enough room for one, and drop everything after it
+        room = remaining - estimate_tokens(header) - estimate_tokens(TRUNCATION_MARKER)
+        if room >= MIN_PARTIAL_TOKENS:
+            partial = truncate_to_tokens(text, room)
+            parts.extend([header, partial, TRUNCATION_MARKER])
+            used += (
+                estimate_tokens(header)
+                + estimate_tokens(partial)
+                + estimate_tokens(TRUNCATION_MARKER)
+            )
+            dropped = len(items) - i - 1
+        else:
+            dropped = len(items) - i
+        break
+
+    if dropped:
+        print(f"✂️ Context budget: dropped {dropped} item(s) that didn't fit in {budget} tokens")
+
+    return "".join(parts), used
+
+
+class ContextBudget:
+    """Hands out per-section budgets under one overall token ceiling."""
+
+    def __init__(self, max_tokens=CONTEXT_MAX_TOKENS, section_budgets=None):
+        self.max_tokens = max_tokens
+        self.section_budgets = dict(SECTION_BUDGETS, **(section_budgets or {}))
+        self.remaining = max_tokens
+
+    def fit(self, section, items):
+        """Fits a section's (header, text) items and charges them to the ceiling."""
+        budget = min(self.section_budgets[section], self.remaining)
+        text, used = fit_items(items, budget)
+        self.remaining -= used
+
+        print(f"📏 {section}: ~{used} tokens (budget {budget}, {self.remaining} left overall)")
+        return text
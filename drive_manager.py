@@ -1,11 +1,29 @@
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload, MediaIoBaseDownload
+from googleapiclient.errors import HttpError
+from googleapiclient.http import (
+    DEFAULT_CHUNK_SIZE,
+    HttpRequest,
+    MediaIoBaseDownload,
+    MediaIoBaseUpload,
+)
 from google.oauth2 import service_account
+from google_auth_httplib2 import AuthorizedHttp
+import httplib2
 import os
 import io
 import json
+import hashlib
+import random
+import socket
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
 
+from extraction import DOCX_MIME_TYPE, extract_buffer_text, extract_docx_file, extract_pdf_file
+from text_cache import text_cache
+
 # ----------------------------------------------------------------------
 # 1. Configuration (IDs and Scopes)
 # ----------------------------------------------------------------------
@@ -13,47 +31,252 @@ FOLDER_ID_PATIENT_DATA = "17CdWnoybK0R7pKsdug7Oxo-Xd4iUVRCX"
 FOLDER_ID_GUIDELINES = "1Wj-O-q9MCdYQz4Uo4zkNFtgPexbTj5rn"
 FOLDER_ID_PROMPT_FRAMEWORK = "1A8oN2RYZMdOCZRmsC6d1kdyeAjzdzfw1"
 
+# Folder ID -> "source" tag attached to every file listed from that folder
+FOLDER_SOURCES = {
+    FOLDER_ID_PATIENT_DATA: "patient_data",
+    FOLDER_ID_GUIDELINES: "guidelines",
+    FOLDER_ID_PROMPT_FRAMEWORK: "prompt_framework",
+}
+
+FILE_FIELDS = "id, name, mimeType, modifiedTime, md5Checksum, parents"
+
 SCOPES = ["https://www.googleapis.com/auth/drive"]
 
+HTTP_TIMEOUT_SECONDS = 60
+MAX_FETCH_WORKERS = 8
+
+# Downloads: bytes per ranged request (the library's 100 MiB default, so most
+# files arrive in one request; a failure resumes from the last whole chunk),
+# and retry policy for transient errors
+DOWNLOAD_CHUNK_SIZE = int(os.environ.get("DOWNLOAD_CHUNK_SIZE", DEFAULT_CHUNK_SIZE))
+DOWNLOAD_MAX_RETRIES = 6
+DOWNLOAD_BACKOFF_BASE_SECONDS = 1.0
+DOWNLOAD_BACKOFF_MAX_SECONDS = 32.0
+
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
 # ----------------------------------------------------------------------
 # 2. Authentication
 # ----------------------------------------------------------------------
-def get_drive_service():
-    """Loads Google service account from Streamlit Secrets."""
-    try:
-        service_account_info = json.loads(st.secrets["GOOGLE_SERVICE_ACCOUNT"])
-        creds = service_account.Credentials.from_service_account_info(
-            service_account_info, scopes=SCOPES
+# The Drive client is built once per process: the service-account JSON is
+# parsed, credentials are created and discovery runs a single time. httplib2
+# connections are not thread-safe, so each thread gets its own keep-alive
+# AuthorizedHttp, all sharing the same credentials (and therefore the same
+# access token until it expires and is refreshed).
+_drive_credentials = None
+_drive_service = None
+_drive_service_lock = threading.Lock()
+_thread_local = threading.local()
+
+
+def _thread_http():
+    """Returns this thread's authorized, keep-alive HTTP connection."""
+    http = getattr(_thread_local, "http", None)
+    if http is None:
+        http = AuthorizedHttp(
+            _drive_credentials, http=httplib2.Http(timeout=HTTP_TIMEOUT_SECONDS)
         )
-        service = build("drive", "v3", credentials=creds)
-        return service
-    except Exception as e:
-        print(f"Error initializing Google Drive service: {e}")
-        return None
+        _thread_local.http = http
+    return http
+
+
+def _build_request(http, *args, **kwargs):
+    """Routes every request through the calling thread's connection."""
+    return HttpRequest(_thread_http(), *args, **kwargs)
+
+
+def get_drive_service():
+    """Returns the process-wide Drive service, creating it on first use."""
+    global _drive_credentials, _drive_service
+
+    if _drive_service is not None:
+        return _drive_service
+
+    with _drive_service_lock:
+        if _drive_service is not None:
+            return _drive_service
+
+        try:
+            service_account_info = json.loads(st.secrets["GOOGLE_SERVICE_ACCOUNT"])
+            _drive_credentials = service_account.Credentials.from_service_account_info(
+                service_account_info, scopes=SCOPES
+            )
+            _drive_service = build(
+                "drive",
+                "v3",
+                http=_thread_http(),
+                requestBuilder=_build_request,
+                cache_discovery=False,
+            )
+        except Exception as e:
+            print(f"Error initializing Google Drive service: {e}")
+            _drive_credentials = None
+            _thread_local.__dict__.pop("http", None)
+            return None
+
+    return _drive_service
 
 
 # ----------------------------------------------------------------------
 # 3. File Listing
 # ----------------------------------------------------------------------
-def api_get_files_in_folder(service, folder_id):
-    """Retrieves metadata for non-trashed files within a specific folder ID."""
+def api_list_folders(service, folder_ids):
+    """
+    Retrieves metadata for non-trashed files in any of the given folders
+    with a single query, following nextPageToken until every page is read.
+    """
     if not service:
         return []
 
-    query = f"'{folder_id}' in parents and trashed=false"
+    parents = " or ".join(f"'{folder_id}' in parents" for folder_id in folder_ids)
+    query = f"({parents}) and trashed=false"
 
-    results = (
-        service.files()
-        .list(q=query, fields="files(id, name, mimeType, modifiedTime)")
-        .execute()
-    )
+    files = []
+    page_token = None
+
+    while True:
+        results = (
+            service.files()
+            .list(
+                q=query,
+                fields=f"nextPageToken, files({FILE_FIELDS})",
+                pageSize=1000,
+                pageToken=page_token,
+            )
+            .execute()
+        )
 
-    return results.get("files", [])
+        files.extend(results.get("files", []))
+        page_token = results.get("nextPageToken")
+        if not page_token:
+            return files
+
+
+def api_get_files_in_folder(service, folder_id):
+    """Retrieves metadata for non-trashed files within a specific folder ID."""
+    return api_list_folders(service, [folder_id])
+
+
+def tag_file_source(file):
+    """Sets file["source"] from the watched folder the file lives in."""
+    for parent in file.get("parents", []):
+        if parent in FOLDER_SOURCES:
+            file["source"] = FOLDER_SOURCES[parent]
+            break
+    return file
+
+
+def files_from_source(all_files, source):
+    """Filters an inventory snapshot down to one source folder."""
+    return [f for f in all_files if f.get("source") == source]
 
 
 # ----------------------------------------------------------------------
 # 4. File Content Extraction (TXT + DOCX + GOOGLE DOCS + PDF + fallback)
 # ----------------------------------------------------------------------
+download_stats = {
+    "downloads": 0,
+    "failures": 0,
+    "retries": 0,
+    "bytes": 0,
+    "seconds": 0.0,
+}
+_download_stats_lock = threading.Lock()
+
+RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded")
+
+
+def _retry_delay(error, attempt):
+    """
+    Seconds to wait before retrying a failed chunk, or None if the error
+    isn't transient (5xx, 429, 403 rate limits, dropped connections).
+    """
+    backoff = min(DOWNLOAD_BACKOFF_BASE_SECONDS * 2 ** attempt, DOWNLOAD_BACKOFF_MAX_SECONDS)
+    backoff *= random.uniform(0.5, 1.0)
+
+    if isinstance(error, HttpError):
+        status = error.resp.status
+
+        if status == 429 or status >= 500:
+            retry_after = error.resp.get("retry-after")
+            if retry_after and retry_after.isdigit():
+                return max(float(retry_after), backoff)
+            return backoff
+
+        if status == 403:
+            content = error.content.decode("utf-8", errors="ignore") if error.content else ""
+            if any(reason in content for reason in RATE_LIMIT_REASONS):
+                return backoff
+
+        return None
+
+    if isinstance(error, (ConnectionError, socket.timeout, httplib2.HttpLib2Error)):
+        return backoff
+
+    return None
+
+
+def download_media(request, fh, chunk_size=DOWNLOAD_CHUNK_SIZE):
+    """
+    Downloads a media/export request into `fh` in ranged chunks.
+    A failed chunk is retried with exponential backoff and the download
+    resumes from the last byte written rather than starting over.
+    Returns the number of bytes downloaded.
+    """
+    downloader = MediaIoBaseDownload(fh, request, chunksize=chunk_size)
+    start_offset = fh.tell()
+    started = time.monotonic()
+    retries = 0
+    attempt = 0
+
+    done = False
+    try:
+        while not done:
+            try:
+                status, done = downloader.next_chunk()
+                attempt = 0
+            except Exception as e:
+                delay = _retry_delay(e, attempt)
+                if delay is None or attempt >= DOWNLOAD_MAX_RETRIES:
+                    raise
+
+                print(
+                    f"Download interrupted at byte {fh.tell() - start_offset} ({e}); "
+                    f"retrying in {delay:.1f}s"
+                )
+                time.sleep(delay)
+                attempt += 1
+                retries += 1
+
+    except Exception:
+        with _download_stats_lock:
+            download_stats["failures"] += 1
+            download_stats["retries"] += retries
+        raise
+
+    size = fh.tell() - start_offset
+    with _download_stats_lock:
+        download_stats["downloads"] += 1
+        download_stats["retries"] += retries
+        download_stats["bytes"] += size
+        download_stats["seconds"] += time.monotonic() - started
+
+    return size
+
+
+def _download_to_temp_file(request, suffix):
+    """Downloads a media request into a new temp file and returns its path."""
+    fd, path = tempfile.mkstemp(suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            download_media(request, fh)
+    except Exception:
+        os.remove(path)
+        raise
+
+    return path
+
+
 def api_get_file_content(service, file_id, mime_type):
     """
     Downloads the content of a file.
@@ -75,10 +298,7 @@ def api_get_file_content(service, file_id, mime_type):
                 fileId=file_id, mimeType="text/plain"
             )
             fh = io.BytesIO()
-            downloader = MediaIoBaseDownload(fh, request)
-            done = False
-            while not done:
-                status, done = downloader.next_chunk()
+            download_media(request, fh)
 
             return fh.getvalue().decode("utf-8", errors="ignore")
 
@@ -90,20 +310,14 @@ def api_get_file_content(service, file_id, mime_type):
     # -------------------------------------------------------------
     # (B) DOCX EXTRACTION
     # -------------------------------------------------------------
-    if mime_type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
+    if mime_type == DOCX_MIME_TYPE:
         try:
             request = service.files().get_media(fileId=file_id)
-            fh = io.BytesIO()
-            downloader = MediaIoBaseDownload(fh, request)
-
-            done = False
-            while not done:
-                status, done = downloader.next_chunk()
-
-            from docx import Document
-            doc = Document(io.BytesIO(fh.getvalue()))
-            full_text = "\n".join([p.text for p in doc.paragraphs])
-            return full_text
+            path = _download_to_temp_file(request, ".docx")
+            try:
+                return extract_docx_file(path)
+            finally:
+                os.remove(path)
 
         except Exception as e:
             print(f"Error extracting DOCX {file_id}: {e}")
@@ -111,28 +325,19 @@ def api_get_file_content(service, file_id, mime_type):
 
 
     # -------------------------------------------------------------
-    # (C) PDF EXTRACTION USING pdfplumber  ✅ NEW
+    # (C) PDF EXTRACTION USING pdfplumber
     # -------------------------------------------------------------
+    # Spooled to a temp file on disk, then extracted page range by page
+    # range in the process pool, so large guideline PDFs are never held in
+    # memory whole and use every core.
     if mime_type == "application/pdf":
         try:
             request = service.files().get_media(fileId=file_id)
-            fh = io.BytesIO()
-            downloader = MediaIoBaseDownload(fh, request)
-
-            done = False
-            while not done:
-                status, done = downloader.next_chunk()
-
-            import pdfplumber
-
-            text = ""
-            with pdfplumber.open(io.BytesIO(fh.getvalue())) as pdf:
-                for page in pdf.pages:
-                    extracted = page.extract_text()
-                    if extracted:
-                        text += extracted + "\n"
-
-            return text.strip()
+            path = _download_to_temp_file(request, ".pdf")
+            try:
+                return extract_pdf_file(path)
+            finally:
+                os.remove(path)
 
         except Exception as e:
             print(f"Error extracting PDF {file_id}: {e}")
@@ -145,11 +350,7 @@ def api_get_file_content(service, file_id, mime_type):
     try:
         request = service.files().get_media(fileId=file_id)
         fh = io.BytesIO()
-        downloader = MediaIoBaseDownload(fh, request)
-
-        done = False
-        while not done:
-            status, done = downloader.next_chunk()
+        download_media(request, fh)
 
         return fh.getvalue().decode("utf-8", errors="ignore")
 
@@ -159,30 +360,101 @@ def api_get_file_content(service, file_id, mime_type):
 
 
 # ----------------------------------------------------------------------
-# 5. Combine All Files (Patient, Guidelines, Frameworks)
+# 5. Cached Text Access
+# ----------------------------------------------------------------------
+def file_version(file):
+    """Returns the identifier of a file's current content (md5, else modifiedTime)."""
+    return file.get("md5Checksum") or file.get("modifiedTime")
+
+
+def fingerprint_files(files):
+    """Stable hash of a set of files' ids and versions (order-independent)."""
+    parts = sorted(f"{f['id']}:{file_version(f)}" for f in files)
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def fingerprint_file_revisions(files):
+    """Like fingerprint_files(), but also changes when only modifiedTime does."""
+    parts = sorted(f"{f['id']}:{f.get('md5Checksum')}:{f.get('modifiedTime')}" for f in files)
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def get_file_text(service, file):
+    """
+    Returns the extracted text of a Drive file given its metadata.
+    Unchanged files are served from the local text cache; only new or
+    edited files are downloaded and parsed.
+    """
+    version = file_version(file)
+
+    if version:
+        cached = text_cache.get(file["id"], version)
+        if cached is not None:
+            return cached
+
+    content = api_get_file_content(service, file["id"], file["mimeType"])
+
+    # Empty text usually means the download failed; don't pin that in the cache
+    if content and version:
+        text_cache.put(file["id"], version, content)
+
+    return content
+
+
+# Shared, bounded pool for Drive downloads so concurrent chat turns can't
+# open an unbounded number of connections between them.
+_fetch_executor = ThreadPoolExecutor(
+    max_workers=MAX_FETCH_WORKERS, thread_name_prefix="drive-fetch"
+)
+
+
+def _fetch_file_text(service, file):
+    try:
+        return get_file_text(service, file)
+    except Exception as e:
+        print(f"Error fetching {file.get('name', file.get('id'))}: {e}")
+        return ""
+
+
+def submit_file_text(service, file):
+    """
+    Starts fetching one file's text on the shared pool and returns the
+    concurrent.futures.Future; cancelling it before it starts skips the download.
+    """
+    return _fetch_executor.submit(_fetch_file_text, service, file)
+
+
+def get_files_text(service, files):
+    """
+    Fetches the text of several files in parallel.
+    Results come back in the same order as `files`; a file that fails to
+    download or parse yields "" without affecting the others.
+    """
+    if len(files) <= 1:
+        return [_fetch_file_text(service, f) for f in files]
+
+    return list(_fetch_executor.map(lambda f: _fetch_file_text(service, f), files))
+
+
+# ----------------------------------------------------------------------
+# 6. Combine All Files (Patient, Guidelines, Frameworks)
 # ----------------------------------------------------------------------
 def list_data_files():
+    """
+    Returns one inventory snapshot of all three folders, each file tagged
+    with its source. Callers within a turn should pass this snapshot around
+    rather than listing folders again.
+    """
     service = get_drive_service()
     if not service:
         return []
 
-    patient_data_files = api_get_files_in_folder(service, FOLDER_ID_PATIENT_DATA)
-    guideline_files = api_get_files_in_folder(service, FOLDER_ID_GUIDELINES)
-    framework_files = api_get_files_in_folder(service, FOLDER_ID_PROMPT_FRAMEWORK)
-
-    for f in patient_data_files:
-        f["source"] = "patient_data"
-    for f in guideline_files:
-        f["source"] = "guidelines"
-    for f in framework_files:
-        f["source"] = "prompt_framework"
-
-    all_files = patient_data_files + guideline_files + framework_files
+    all_files = [tag_file_source(f) for f in api_list_folders(service, list(FOLDER_SOURCES))]
     return sorted(all_files, key=lambda x: x["modifiedTime"], reverse=True)
 
 
 # ----------------------------------------------------------------------
-# 6. Framework Loader
+# 7. Framework Loader
 # ----------------------------------------------------------------------
 def get_framework_content():
     service = get_drive_service()
@@ -193,10 +465,10 @@ def get_framework_content():
 
     full_framework_content = []
 
-    for file in framework_files:
-        print(f"Retrieving framework content: {file['name']}")
-        content = api_get_file_content(service, file["id"], file["mimeType"])
+    print(f"Retrieving framework content: {[f['name'] for f in framework_files]}")
+    contents = get_files_text(service, framework_files)
 
+    for file, content in zip(framework_files, contents):
         section = (
             f"--- START OF PROMPT FRAMEWORK: {file['name']} ---\n"
             f"{content}\n"
@@ -209,37 +481,78 @@ def get_framework_content():
 
 
 # ----------------------------------------------------------------------
-# 7. Upload File
+# 8. Upload File
 # ----------------------------------------------------------------------
+def _notify_index(upserted=(), removed=()):
+    """Applies this process's own writes to the synced file index immediately."""
+    # Imported here: drive_sync builds on this module
+    from drive_sync import get_drive_sync
+
+    sync = get_drive_sync()
+    for file in upserted:
+        sync.upsert(file)
+    for file_id in removed:
+        sync.remove(file_id)
+
+
+def _warm_text_cache(file, uploaded_file):
+    """Extracts a just-uploaded file from memory into the text cache."""
+    try:
+        content = extract_buffer_text(uploaded_file, file["mimeType"])
+        if content and file_version(file):
+            text_cache.put(file["id"], file_version(file), content)
+    except Exception as e:
+        print(f"Error caching text for upload {file['name']}: {e}")
+
+
 def upload_file(uploaded_file):
+    """
+    Uploads a Streamlit UploadedFile straight from memory (resumable, in
+    chunks) and seeds the text cache so the next query needn't download it.
+    """
     service = get_drive_service()
     if not service:
         return "Upload failed: Service not initialized."
 
     target_folder_id = FOLDER_ID_PATIENT_DATA
-    temp_path = uploaded_file.name
 
     try:
-        with open(temp_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
+        # UploadedFile is an in-memory BytesIO, so it is streamed as-is
+        uploaded_file.seek(0)
+        media = MediaIoBaseUpload(
+            uploaded_file,
+            mimetype=uploaded_file.type or "application/octet-stream",
+            chunksize=UPLOAD_CHUNK_SIZE,
+            resumable=True,
+        )
 
         file_metadata = {"name": uploaded_file.name, "parents": [target_folder_id]}
-        media = MediaFileUpload(temp_path, resumable=True)
-        service.files().create(body=file_metadata, media_body=media, fields="id").execute()
+        created = (
+            service.files()
+            .create(body=file_metadata, media_body=media, fields=FILE_FIELDS)
+            .execute(num_retries=DOWNLOAD_MAX_RETRIES)
+        )
 
-        os.remove(temp_path)
+        _fetch_executor.submit(_warm_text_cache, created, uploaded_file)
+        _notify_index(upserted=[created])
         return uploaded_file.name
 
     except Exception as e:
-        if os.path.exists(temp_path):
-            os.remove(temp_path)
-
         print(f"Upload failed: {e}")
         return f"Upload failed: {e}"
 
 
+def upload_files(uploaded_files):
+    """Uploads several files concurrently; results come back in input order."""
+    if len(uploaded_files) <= 1:
+        return [upload_file(f) for f in uploaded_files]
+
+    with ThreadPoolExecutor(max_workers=MAX_FETCH_WORKERS, thread_name_prefix="drive-upload") as pool:
+        return list(pool.map(upload_file, uploaded_files))
+
+
 # ----------------------------------------------------------------------
-# 8. Delete File
+# 9. Delete File
 # ----------------------------------------------------------------------
 def delete_file(file_id):
     service = get_drive_service()
@@ -249,14 +562,121 @@ def delete_file(file_id):
     try:
         service.files().delete(fileId=file_id).execute()
         print(f"File ID {file_id} deleted.")
+        _notify_index(removed=[file_id])
     except Exception as e:
         print(f"Error deleting file {file_id}: {e}")
-def get_guideline_filenames():
-    """Return only filenames (not content) for guidelines."""
+
+
+# ----------------------------------------------------------------------
+# 10. Batch Operations (one HTTP round-trip per 100 operations)
+# ----------------------------------------------------------------------
+BATCH_MAX_OPERATIONS = 100
+
+
+def execute_batch(service, requests):
+    """
+    Runs Drive API requests through BatchHttpRequest, up to 100 per call.
+    Returns one {"response", "error"} dict per request, in input order.
+    """
+    results = [None] * len(requests)
+
+    def make_callback(index):
+        def callback(request_id, response, exception):
+            results[index] = {"response": response, "error": exception}
+        return callback
+
+    for start in range(0, len(requests), BATCH_MAX_OPERATIONS):
+        chunk = requests[start:start + BATCH_MAX_OPERATIONS]
+        batch = service.new_batch_http_request()
+
+        for index, request in enumerate(chunk, start):
+            batch.add(request, callback=make_callback(index), request_id=str(index))
+
+        try:
+            batch.execute()
+        except Exception as e:
+            print(f"Batch request failed: {e}")
+            for index in range(start, start + len(chunk)):
+                if results[index] is None:
+                    results[index] = {"response": None, "error": e}
+
+    return results
+
+
+def _batch_file_operation(file_ids, make_request, invalidate_cache=False, index_update=None):
     service = get_drive_service()
     if not service:
-        return []
+        return [{"id": fid, "response": None, "error": "Service not initialized."} for fid in file_ids]
+
+    results = execute_batch(service, [make_request(service, fid) for fid in file_ids])
+
+    for file_id, result in zip(file_ids, results):
+        result["id"] = file_id
+        if result["error"] is not None:
+            print(f"Error on file {file_id}: {result['error']}")
+        elif invalidate_cache:
+            text_cache.invalidate(file_id)
+
+    succeeded = [r for r in results if r["error"] is None]
+    if index_update == "remove" and succeeded:
+        _notify_index(removed=[r["id"] for r in succeeded])
+    elif index_update == "upsert" and succeeded:
+        _notify_index(upserted=[r["response"] for r in succeeded])
+
+    return results
+
+
+def delete_files(file_ids):
+    """Permanently deletes many files in batched round-trips."""
+    return _batch_file_operation(
+        file_ids,
+        lambda service, fid: service.files().delete(fileId=fid),
+        invalidate_cache=True,
+        index_update="remove",
+    )
 
-    guideline_files = api_get_files_in_folder(service, FOLDER_ID_GUIDELINES)
 
-    return [{"id": f["id"], "name": f["name"], "mimeType": f["mimeType"]} for f in guideline_files]
+def get_files_metadata(file_ids):
+    """Fetches metadata for many files in batched round-trips."""
+    return _batch_file_operation(
+        file_ids,
+        lambda service, fid: service.files().get(fileId=fid, fields=f"{FILE_FIELDS}, trashed"),
+    )
+
+
+def trash_files(file_ids):
+    """Moves many files to the trash in batched round-trips."""
+    return _batch_file_operation(
+        file_ids,
+        lambda service, fid: service.files().update(fileId=fid, body={"trashed": True}, fields=FILE_FIELDS),
+        invalidate_cache=True,
+        index_update="remove",
+    )
+
+
+def restore_files(file_ids):
+    """Restores many files from the trash in batched round-trips."""
+    return _batch_file_operation(
+        file_ids,
+        lambda service, fid: service.files().update(fileId=fid, body={"trashed": False}, fields=FILE_FIELDS),
+        index_update="upsert",
+    )
+
+
+def get_guideline_filenames(all_files=None):
+    """Return only filenames (not content) for guidelines."""
+    if all_files is None:
+        all_files = list_data_files()
+
+    guideline_files = files_from_source(all_files, "guidelines")
+
+    return [
+        {
+            "id": f["id"],
+            "name": f["name"],
+            "mimeType": f["mimeType"],
+            "modifiedTime": f.get("modifiedTime"),
+            "md5Checksum": f.get("md5Checksum"),
+        }
+        for f in guideline_files
+    ]
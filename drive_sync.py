@@ -0,0 +1,216 @@
+"""
+Background Drive sync using the Changes API.
+
+A one-off listing seeds a local index of every file in the watched folders.
+A daemon thread then polls changes().list from the saved page token and
+applies adds, edits and trashes to that index, invalidating the cached text
+of files whose content changed. Reading the index never touches Drive.
+
+Other modules can register a listener to hear about every file the index
+adds, edits or drops, whether the change came from a poll or from one of
+this process's own writes.
+"""
+import threading
+
+from drive_manager import (
+    FILE_FIELDS,
+    FOLDER_SOURCES,
+    api_list_folders,
+    file_version,
+    get_drive_service,
+    list_data_files,
+    tag_file_source,
+)
+from text_cache import text_cache
+
+SYNC_POLL_SECONDS = 30
+SYNC_READY_TIMEOUT_SECONDS = 30
+
+
+class DriveSync:
+    """Local index of the watched folders, kept current by polling Drive changes."""
+
+    def __init__(self, poll_seconds=SYNC_POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self.version = 0  # bumped every time the index changes
+
+        self._files = {}  # file id -> metadata (tagged with "source")
+        self._page_token = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()  # set once the first sync attempt finishes
+        self._stop = threading.Event()
+        self._thread = None
+        self._listeners = []
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+    def start(self):
+        """Starts the polling thread (no-op if it is already running)."""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="drive-sync", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def add_listener(self, callback):
+        """Registers callback(files), called with the metadata of changed files."""
+        with self._lock:
+            self._listeners.append(callback)
+
+    def _notify(self, files):
+        for callback in list(self._listeners):
+            try:
+                callback(files)
+            except Exception as e:
+                print(f"Error in Drive sync listener: {e}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                changed = self.poll()
+                if changed:
+                    print(f"🔄 Drive sync applied {len(changed)} change(s)")
+            except Exception as e:
+                print(f"Error polling Drive changes: {e}")
+            self._ready.set()
+            self._stop.wait(self.poll_seconds)
+
+    # ------------------------------------------------------------------
+    # Syncing
+    # ------------------------------------------------------------------
+    def _seed(self, service):
+        # Take the token before listing so nothing that changes mid-listing is missed
+        token = service.changes().getStartPageToken().execute()["startPageToken"]
+        files = api_list_folders(service, list(FOLDER_SOURCES))
+
+        with self._lock:
+            self._files = {f["id"]: tag_file_source(f) for f in files}
+            self._page_token = token
+            self.version += 1
+
+        print(f"📂 Drive sync seeded with {len(files)} file(s)")
+
+    def poll(self):
+        """Applies every pending Drive change to the index; returns the changed ids."""
+        service = get_drive_service()
+        if not service:
+            return []
+
+        if self._page_token is None:
+            self._seed(service)
+            return []
+
+        changed = []
+
+        while True:
+            results = (
+                service.changes()
+                .list(
+                    pageToken=self._page_token,
+                    fields=(
+                        "nextPageToken, newStartPageToken, "
+                        f"changes(fileId, removed, file({FILE_FIELDS}, trashed))"
+                    ),
+                    pageSize=1000,
+                    includeRemoved=True,
+                )
+                .execute()
+            )
+
+            for change in results.get("changes", []):
+                if self._apply(change):
+                    changed.append(change["fileId"])
+
+            if "nextPageToken" in results:
+                self._page_token = results["nextPageToken"]
+                continue
+
+            self._page_token = results["newStartPageToken"]
+            return changed
+
+    def _apply(self, change):
+        """Applies one change record; returns True if the index was modified."""
+        file_id = change["fileId"]
+        file = change.get("file")
+
+        watched = (
+            file is not None
+            and not change.get("removed")
+            and not file.get("trashed")
+            and any(p in FOLDER_SOURCES for p in file.get("parents", []))
+        )
+
+        with self._lock:
+            previous = self._files.get(file_id)
+
+            if watched:
+                file.pop("trashed", None)
+                current = tag_file_source(file)
+                self._files[file_id] = current
+            elif previous is not None:
+                del self._files[file_id]
+            else:
+                return False
+
+            self.version += 1
+
+        # Only drop cached text when the content itself moved on
+        if previous is not None and (not watched or file_version(previous) != file_version(file)):
+            text_cache.invalidate(file_id)
+
+        self._notify([dict(current) if watched else previous])
+        return True
+
+    def upsert(self, file):
+        """Applies a file this process just created or restored, without waiting for a poll."""
+        return self._apply({"fileId": file["id"], "file": dict(file)})
+
+    def remove(self, file_id):
+        """Applies a file this process just deleted or trashed, without waiting for a poll."""
+        return self._apply({"fileId": file_id, "removed": True})
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+    def list_files(self):
+        """
+        Returns the indexed files, newest first, in the same shape as
+        list_data_files(). Falls back to a direct listing if the index
+        hasn't been seeded yet.
+        """
+        self._ready.wait(SYNC_READY_TIMEOUT_SECONDS)
+
+        if self._page_token is None:
+            print("⚠️ Drive sync not ready; listing folders directly.")
+            return list_data_files()
+
+        with self._lock:
+            files = [dict(f) for f in self._files.values()]
+
+        return sorted(files, key=lambda x: x["modifiedTime"], reverse=True)
+
+
+# ----------------------------------------------------------------------
+# Process-wide instance
+# ----------------------------------------------------------------------
+_drive_sync = None
+_drive_sync_lock = threading.Lock()
+
+
+def get_drive_sync():
+    """Returns the shared DriveSync, starting its polling thread on first use."""
+    global _drive_sync
+
+    with _drive_sync_lock:
+        if _drive_sync is None:
+            _drive_sync = DriveSync()
+            _drive_sync.start()
+
+    return _drive_sync
@@ -0,0 +1,172 @@
+"""
+Text extraction from downloaded documents.
+
+PDF pages are extracted lazily, one at a time, from a file on disk, and each
+page's parsed layout is released as soon as its text is taken, so peak memory
+stays roughly flat regardless of document size. Extraction can stop early at
+a page or character budget.
+
+Extraction is CPU-bound, so it runs on a process pool: a large PDF is split
+into page ranges handled by different workers, and documents fetched on
+different threads are extracted side by side.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+DOCX_MIME_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+# Optional early-stop limits for PDF extraction (unset = whole document)
+PDF_MAX_PAGES = int(os.environ["PDF_MAX_PAGES"]) if os.environ.get("PDF_MAX_PAGES") else None
+PDF_MAX_CHARS = int(os.environ["PDF_MAX_CHARS"]) if os.environ.get("PDF_MAX_CHARS") else None
+
+# Worker processes for extraction (1 disables the pool and extracts inline)
+EXTRACTION_WORKERS = int(os.environ.get("EXTRACTION_WORKERS", os.cpu_count() or 1))
+
+# PDFs are split into tasks of this many pages
+PDF_PAGES_PER_TASK = 20
+
+
+def iter_pdf_pages(source, first_page=0, last_page=None):
+    """
+    Yields the text of each page of a PDF (path or binary file object),
+    from `first_page` up to but not including `last_page`.
+    """
+    import pdfplumber
+
+    with pdfplumber.open(source) as pdf:
+        pages = pdf.pages[first_page:last_page]
+        for page in pages:
+            try:
+                yield page.extract_text() or ""
+            finally:
+                # Drop the page's parsed objects before moving on
+                page.close()
+
+
+def extract_pdf_text(source, max_pages=PDF_MAX_PAGES, max_chars=PDF_MAX_CHARS):
+    """Extracts PDF text page by page, stopping early at either budget."""
+    parts = []
+    chars = 0
+
+    for page_number, extracted in enumerate(iter_pdf_pages(source, last_page=max_pages)):
+        if not extracted:
+            continue
+
+        parts.append(extracted)
+        chars += len(extracted) + 1
+
+        if max_chars is not None and chars >= max_chars:
+            print(f"PDF character budget reached after page {page_number + 1}")
+            break
+
+    text = "\n".join(parts)
+    return text[:max_chars].strip() if max_chars is not None else text.strip()
+
+
+def extract_docx_text(source):
+    """Extracts paragraph text from a DOCX (path or binary file object)."""
+    from docx import Document
+
+    doc = Document(source)
+    return "\n".join([p.text for p in doc.paragraphs])
+
+
+def extract_buffer_text(fh, mime_type):
+    """Extracts text from an in-memory, seekable document of the given type."""
+    fh.seek(0)
+
+    if mime_type == "application/pdf":
+        return extract_pdf_text(fh)
+    if mime_type == DOCX_MIME_TYPE:
+        return extract_docx_text(fh)
+    return fh.read().decode("utf-8", errors="ignore")
+
+
+# ----------------------------------------------------------------------
+# Process pool
+# ----------------------------------------------------------------------
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def get_process_pool():
+    """Returns the shared extraction pool, or None when extraction runs inline."""
+    global _process_pool
+
+    if EXTRACTION_WORKERS <= 1:
+        return None
+
+    with _process_pool_lock:
+        if _process_pool is None:
+            # "spawn" because forking a process that already runs threads is unsafe
+            _process_pool = ProcessPoolExecutor(
+                max_workers=EXTRACTION_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _process_pool
+
+
+def _reset_process_pool():
+    global _process_pool
+
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+
+def count_pdf_pages(path):
+    """Number of pages in a PDF file."""
+    import pdfplumber
+
+    with pdfplumber.open(path) as pdf:
+        return len(pdf.pages)
+
+
+def extract_pdf_page_range(path, first_page, last_page):
+    """Text of pages [first_page, last_page) of a PDF file, joined by newlines."""
+    return "\n".join(t for t in iter_pdf_pages(path, first_page, last_page) if t)
+
+
+def extract_pdf_file(path, max_pages=PDF_MAX_PAGES, max_chars=PDF_MAX_CHARS):
+    """
+    Extracts a PDF on disk, spreading page ranges across the process pool.
+    With a character budget the pages are read sequentially instead, so
+    extraction can stop as soon as the budget is reached.
+    """
+    pool = get_process_pool()
+    if pool is None or max_chars is not None:
+        return extract_pdf_text(path, max_pages=max_pages, max_chars=max_chars)
+
+    try:
+        page_count = pool.submit(count_pdf_pages, path).result()
+        if max_pages is not None:
+            page_count = min(page_count, max_pages)
+
+        futures = [
+            pool.submit(extract_pdf_page_range, path, first, min(first + PDF_PAGES_PER_TASK, page_count))
+            for first in range(0, page_count, PDF_PAGES_PER_TASK)
+        ]
+        return "\n".join(part for part in (f.result() for f in futures) if part).strip()
+
+    except BrokenProcessPool as e:
+        print(f"Extraction pool failed ({e}); extracting inline.")
+        _reset_process_pool()
+        return extract_pdf_text(path, max_pages=max_pages, max_chars=max_chars)
+
+
+def extract_docx_file(path):
+    """Extracts a DOCX on disk in the process pool."""
+    pool = get_process_pool()
+    if pool is None:
+        return extract_docx_text(path)
+
+    try:
+        return pool.submit(extract_docx_text, path).result()
+    except BrokenProcessPool as e:
+        print(f"Extraction pool failed ({e}); extracting inline.")
+        _reset_process_pool()
+        return extract_docx_text(path)
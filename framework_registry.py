@@ -0,0 +1,87 @@
+"""
+In-memory registry of prompt frameworks.
+
+Each framework file is downloaded and its "Function:" header parsed once;
+after that only files whose version (md5Checksum / modifiedTime) changed are
+fetched again. Files without the header are remembered too, so they aren't
+re-downloaded just to be skipped.
+"""
+import threading
+
+from drive_manager import file_version, get_drive_service, get_files_text
+
+
+def parse_framework_header(content):
+    """Returns the function name from a "Function: ..." first line, or None."""
+    first_line = content.split("\n")[0]
+
+    # Remove BOM + whitespace
+    clean_first_line = first_line.lstrip("\ufeff").strip()
+
+    if clean_first_line.lower().startswith("function:"):
+        return clean_first_line.replace("Function:", "").strip()
+    return None
+
+
+class FrameworkRegistry:
+    """Function name -> framework content, refreshed per changed file."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}  # file id -> {"version", "file_name", "name", "content"}
+
+    def refresh(self, framework_files, service=None):
+        """
+        Brings the registry in line with `framework_files` (Drive metadata for
+        the framework folder) and returns the frameworks in listing order.
+        Only new or modified files are downloaded.
+        """
+        with self._lock:
+            stale = [
+                f for f in framework_files
+                if self._entries.get(f["id"], {}).get("version") != file_version(f)
+            ]
+
+        if stale:
+            print(" Reading framework files:", [f["name"] for f in stale])
+            contents = get_files_text(service or get_drive_service(), stale)
+
+            parsed = {}
+            for f, content in zip(stale, contents):
+                if not content:
+                    # Leave it out so the next refresh retries the download
+                    print(f"⚠️ {f['name']}: file content EMPTY or unreadable.")
+                    continue
+
+                function_name = parse_framework_header(content)
+                if function_name:
+                    print(f"✅ {f['name']}: framework detected. Function name:", function_name)
+                else:
+                    print(f"{f['name']} does NOT start with 'Function:' — skipped.")
+
+                parsed[f["id"]] = {
+                    "version": file_version(f),
+                    "file_name": f["name"],
+                    "name": function_name,
+                    "content": content if function_name else None,
+                }
+
+        with self._lock:
+            if stale:
+                self._entries.update(parsed)
+
+            # Forget files that are no longer in the folder
+            current_ids = {f["id"] for f in framework_files}
+            for file_id in list(self._entries):
+                if file_id not in current_ids:
+                    del self._entries[file_id]
+
+            return [
+                {"name": entry["name"], "content": entry["content"]}
+                for entry in (self._entries.get(f["id"]) for f in framework_files)
+                if entry and entry["name"]
+            ]
+
+
+# Shared process-wide instance
+framework_registry = FrameworkRegistry()
@@ -0,0 +1,297 @@
+"""
+Local BM25 retrieval index over guideline passages.
+
+Every guideline document is split into overlapping word windows, and the
+passages are indexed into term -> (passage, term frequency) postings stored
+as flat NumPy arrays (CSR layout by term). The index is persisted to disk and
+rebuilt only when the guideline folder's files change. At query time the
+top-k passages for the question (weighted in full) and the patient data
+(its most frequent terms, down-weighted) are returned, so the final
+prompt carries relevant excerpts instead of whole PDFs and no selector LLM
+call is needed.
+
+Build it ahead of time with:  python guideline_index.py
+"""
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+
+from drive_manager import (
+    fingerprint_files,
+    files_from_source,
+    get_drive_service,
+    get_files_text,
+    list_data_files,
+)
+
+GUIDELINE_INDEX_DIR = os.environ.get("GUIDELINE_INDEX_DIR", ".guideline_index")
+GUIDELINE_TOP_K = 12
+
+CHUNK_WORDS = 220
+CHUNK_OVERLAP_WORDS = 40
+
+# An index missing some files' text (failed download, scanned PDF with no
+# text layer) is kept in memory but not saved, and rebuilt after this long
+PARTIAL_INDEX_RETRY_SECONDS = 10 * 60
+
+# Patient-data terms only steer the ranking: at most this many of them, each
+# counting for this fraction of a question term
+CONTEXT_MAX_TERMS = 48
+CONTEXT_TERM_WEIGHT = 0.25
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+STOPWORDS = frozenset(
+    """
+    a an and are as at be been but by can do for from had has have if in into
+    is it its may me my no not of on or our should such than that the their
+    then there these they this to was were what when which who will with you
+    your
+    """.split()
+)
+
+
+# ----------------------------------------------------------------------
+# Text processing
+# ----------------------------------------------------------------------
+def tokenize(text):
+    """Lowercased word tokens without stopwords, bare numbers or single letters."""
+    return [
+        t for t in re.findall(r"[a-z0-9]+", text.lower())
+        if len(t) > 1 and not t.isdigit() and t not in STOPWORDS
+    ]
+
+
+def chunk_text(text, chunk_words=CHUNK_WORDS, overlap=CHUNK_OVERLAP_WORDS):
+    """Splits text into overlapping windows of roughly `chunk_words` words."""
+    words = text.split()
+    step = chunk_words - overlap
+    return [
+        " ".join(words[i:i + chunk_words])
+        for i in range(0, max(len(words) - overlap, 1), step)
+        if words[i:i + chunk_words]
+    ]
+
+
+# ----------------------------------------------------------------------
+# Index
+# ----------------------------------------------------------------------
+class GuidelineIndex:
+    """BM25 index over guideline passages."""
+
+    def __init__(self, fingerprint, chunks, vocab, indptr, indices, tfs, doc_len):
+        self.fingerprint = fingerprint
+        self.chunks = chunks  # [{"file_name", "text"}], one per passage
+        self.vocab = vocab  # term -> term id
+        self.indptr = indptr  # postings of term t are [indptr[t], indptr[t + 1])
+        self.indices = indices  # passage id per posting
+        self.tfs = tfs  # term frequency per posting
+        self.doc_len = doc_len  # tokens per passage
+
+        avgdl = doc_len.mean() if len(doc_len) else 1.0
+        self._length_norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_len / avgdl)
+
+    @classmethod
+    def build(cls, fingerprint, documents):
+        """Builds an index from (file_name, text) pairs."""
+        chunks = []
+        vocab = {}
+        posting_terms, posting_docs, posting_tfs, doc_len = [], [], [], []
+
+        for file_name, text in documents:
+            for passage in chunk_text(text):
+                tokens = tokenize(passage)
+                if not tokens:
+                    continue
+
+                chunk_id = len(chunks)
+                chunks.append({"file_name": file_name, "text": passage})
+                doc_len.append(len(tokens))
+
+                for term, tf in Counter(tokens).items():
+                    posting_terms.append(vocab.setdefault(term, len(vocab)))
+                    posting_docs.append(chunk_id)
+                    posting_tfs.append(tf)
+
+        term_ids = np.array(posting_terms, dtype=np.int64)
+        order = np.argsort(term_ids, kind="stable")
+
+        indptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(vocab)), out=indptr[1:])
+
+        return cls(
+            fingerprint,
+            chunks,
+            vocab,
+            indptr,
+            np.array(posting_docs, dtype=np.int32)[order],
+            np.array(posting_tfs, dtype=np.float32)[order],
+            np.array(doc_len, dtype=np.float32),
+        )
+
+    def search(self, query, k=GUIDELINE_TOP_K, context=""):
+        """
+        Returns up to k passages ranked by BM25 score against the query, with
+        the context's (patient data's) most frequent terms at a lower weight.
+        """
+        n = len(self.chunks)
+        if n == 0:
+            return []
+
+        context_terms = Counter(t for t in tokenize(context) if t in self.vocab)
+        weights = {
+            self.vocab[t]: CONTEXT_TERM_WEIGHT
+            for t, _ in context_terms.most_common(CONTEXT_MAX_TERMS)
+        }
+        weights.update((self.vocab[t], 1.0) for t in tokenize(query) if t in self.vocab)
+
+        scores = np.zeros(n, dtype=np.float32)
+
+        for t, weight in weights.items():
+            start, end = self.indptr[t], self.indptr[t + 1]
+            docs = self.indices[start:end]
+            tf = self.tfs[start:end]
+            df = end - start
+
+            idf = np.log(1 + (n - df + 0.5) / (df + 0.5))
+            # Each passage appears at most once per term, so plain += is safe
+            scores[docs] += weight * idf * tf * (BM25_K1 + 1) / (tf + self._length_norm[docs])
+
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+
+        return [
+            dict(self.chunks[i], score=float(scores[i]))
+            for i in top
+            if scores[i] > 0
+        ]
+
+    def leading_passages(self, k=GUIDELINE_TOP_K):
+        """The opening passage of each file (up to k), for when nothing matches."""
+        seen, passages = set(), []
+        for chunk in self.chunks:
+            if chunk["file_name"] not in seen:
+                seen.add(chunk["file_name"])
+                passages.append(dict(chunk, score=0.0))
+                if len(passages) == k:
+                    break
+        return passages
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    def save(self, directory=GUIDELINE_INDEX_DIR):
+        os.makedirs(directory, exist_ok=True)
+
+        np.savez(
+            os.path.join(directory, "postings.npz"),
+            indptr=self.indptr,
+            indices=self.indices,
+            tfs=self.tfs,
+            doc_len=self.doc_len,
+        )
+
+        # Metadata goes last (atomically), so it never points at stale postings
+        meta_path = os.path.join(directory, "meta.json")
+        with open(f"{meta_path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "fingerprint": self.fingerprint,
+                    "vocab": list(self.vocab),
+                    "chunks": self.chunks,
+                },
+                f,
+            )
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+    @classmethod
+    def load(cls, directory=GUIDELINE_INDEX_DIR):
+        """Loads a saved index, or returns None if there isn't a usable one."""
+        try:
+            with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with np.load(os.path.join(directory, "postings.npz")) as postings:
+                index = cls(
+                    meta["fingerprint"],
+                    meta["chunks"],
+                    {term: i for i, term in enumerate(meta["vocab"])},
+                    postings["indptr"],
+                    postings["indices"],
+                    postings["tfs"],
+                    postings["doc_len"],
+                )
+        except (OSError, ValueError, KeyError) as e:
+            print(f"No usable guideline index on disk: {e}")
+            return None
+
+        if len(index.indptr) != len(index.vocab) + 1 or len(index.doc_len) != len(index.chunks):
+            return None
+        return index
+
+
+# ----------------------------------------------------------------------
+# Process-wide index
+# ----------------------------------------------------------------------
+_index = None
+_index_retry_at = None  # when a partial _index is due for a rebuild (None if complete)
+_index_lock = threading.Lock()
+
+
+def get_guideline_index(guideline_files, service=None):
+    """
+    Returns the index for the current set of guideline files, loading it
+    from disk or rebuilding it when any guideline was added, edited or removed.
+    """
+    global _index, _index_retry_at
+
+    fingerprint = fingerprint_files(guideline_files)
+
+    with _index_lock:
+        if (
+            _index is not None
+            and _index.fingerprint == fingerprint
+            and (_index_retry_at is None or time.monotonic() < _index_retry_at)
+        ):
+            return _index
+
+        index = GuidelineIndex.load()
+        if index is not None and index.fingerprint == fingerprint:
+            _index, _index_retry_at = index, None
+            return index
+
+        print(f"📚 Building guideline index over {len(guideline_files)} file(s)...")
+        texts = get_files_text(service or get_drive_service(), guideline_files)
+        index = GuidelineIndex.build(
+            fingerprint, [(f["name"], text) for f, text in zip(guideline_files, texts)]
+        )
+        print(f"📚 Indexed {len(index.chunks)} passages, {len(index.vocab)} terms")
+
+        # A file with no text would be missing until it next changes, so an
+        # index built without it isn't saved and is retried after a while
+        if all(texts):
+            index.save()
+            _index_retry_at = None
+        else:
+            missing = [f["name"] for f, text in zip(guideline_files, texts) if not text]
+            print(f"⚠️ No text for {missing}; retrying in {PARTIAL_INDEX_RETRY_SECONDS}s")
+            _index_retry_at = time.monotonic() + PARTIAL_INDEX_RETRY_SECONDS
+
+        _index = index
+        return index
+
+
+def retrieve_guideline_passages(guideline_files, query, k=GUIDELINE_TOP_K, context=""):
+    """Top-k guideline passages for the question, steered by the patient data."""
+    return get_guideline_index(guideline_files).search(query, k, context=context)
+
+
+if __name__ == "__main__":
+    guideline_files = files_from_source(list_data_files(), "guidelines")
+    get_guideline_index(guideline_files)
@@ -0,0 +1,195 @@
+"""
+Background execution of the response pipeline for the Streamlit app.
+
+Each question runs as a Job on a process-wide thread pool, so the script
+run that submitted it returns immediately and the UI stays responsive. Jobs
+are tracked per browser session; a rerun (a click, a new question) doesn't
+cancel anything, it just picks the same Job back up.
+
+Jobs are also coalesced: a question whose request key (question, framework,
+patient data and guideline files) matches a Job that is still running joins
+that Job instead of starting another, whichever session asked first. During
+a burst of preset-question clicks the pipeline then runs once per distinct
+request, and every session streams the same answer. This is the app's only
+coalescing layer; background callers (warm-up) use answer() to share it.
+
+Preset questions whose inputs haven't changed are answered from the answer
+cache: their Job is created already finished and no worker is involved.
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from drive_sync import get_drive_sync
+from workflow import (
+    cached_answer,
+    prepare_final_request,
+    request_key,
+    store_answer,
+    stream_final_response,
+)
+
+JOB_WORKERS = 8
+
+# Finished jobs nobody collected are dropped after this long
+JOB_RETENTION_SECONDS = 30 * 60
+
+
+class Job:
+    """One generate_response run: its stage, streamed output and outcome."""
+
+    def __init__(self, query, key, all_files):
+        self.id = uuid.uuid4().hex
+        self.query = query
+        self.key = key
+        self.all_files = all_files
+        self.stage = "Queued"
+        self.chunks = []
+        self.error = None
+        self.done = False
+        self.finished_at = None
+        self.cached = False
+        self._finished = threading.Event()
+
+    @property
+    def text(self):
+        return "".join(self.chunks)
+
+    def run(self):
+        try:
+            self.stage = "Gathering patient data and guidelines..."
+            final_request = prepare_final_request(self.query, self.all_files)
+
+            self.stage = "Claude is writing..."
+            for delta in stream_final_response(final_request):
+                self.chunks.append(delta)
+
+            store_answer(self.key, self.text)
+            self.stage = "Done"
+
+        except Exception as e:
+            print(f"Job {self.id} failed: {e}")
+            self.error = str(e)
+            self.stage = "Failed"
+
+        finally:
+            self.all_files = None
+            self.finished_at = time.monotonic()
+            self.done = True
+            self._finished.set()
+
+    def wait(self, timeout=None):
+        """Blocks until the Job finishes; returns whether it did."""
+        return self._finished.wait(timeout)
+
+    def resolve(self, answer):
+        """Finishes the Job with an answer that didn't need the pipeline."""
+        self.chunks = [answer]
+        self.cached = True
+        self.stage = "Done"
+        self.all_files = None
+        self.finished_at = time.monotonic()
+        self.done = True
+        self._finished.set()
+
+
+class JobExecutor:
+    """Thread pool of Jobs, shared between sessions asking the same question."""
+
+    def __init__(self, max_workers=JOB_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="response-job")
+        self._lock = threading.Lock()
+        self._jobs = {}      # job id -> Job
+        self._sessions = {}  # session id -> set of job ids it is waiting on
+        self._inflight = {}  # request key -> running Job
+
+    def submit(self, session_id, query, force=False):
+        """
+        Starts a Job for this question, or joins the one already running it.
+        A cached preset answer finishes the Job at once unless force is set.
+        """
+        all_files = get_drive_sync().list_files()
+        key = request_key(query, all_files)
+        answer = None if force else cached_answer(key)
+
+        with self._lock:
+            self._prune()
+
+            if answer is not None:
+                job = Job(query, key, None)
+                job.resolve(answer)
+                self._jobs[job.id] = job
+                self._sessions.setdefault(session_id, set()).add(job.id)
+                return job
+
+            job = self._inflight.get(key)
+            start = job is None
+            if start:
+                job = Job(query, key, all_files)
+                self._jobs[job.id] = job
+                self._inflight[key] = job
+            else:
+                print(f"🔗 Joining in-flight job for: {query}")
+
+            self._sessions.setdefault(session_id, set()).add(job.id)
+
+        if start:
+            self._pool.submit(self._run, job)
+        return job
+
+    def answer(self, session_id, query, force=False):
+        """
+        Blocking variant of submit() for callers outside the chat UI: waits
+        for the (possibly shared) Job and returns its answer.
+        """
+        job = self.submit(session_id, query, force=force)
+        job.wait()
+        self.collect(session_id, job.id)
+
+        if job.error:
+            raise RuntimeError(job.error)
+        return job.text
+
+    def _run(self, job):
+        job.run()
+        with self._lock:
+            if self._inflight.get(job.key) is job:
+                del self._inflight[job.key]
+
+    def get(self, session_id, job_id):
+        with self._lock:
+            if job_id in self._sessions.get(session_id, ()):
+                return self._jobs.get(job_id)
+            return None
+
+    def collect(self, session_id, job_id):
+        """Detaches a finished Job from a session once its answer has been shown."""
+        with self._lock:
+            session_jobs = self._sessions.get(session_id, set())
+            if job_id not in session_jobs:
+                return None
+
+            session_jobs.discard(job_id)
+            if not session_jobs:
+                del self._sessions[session_id]
+
+            job = self._jobs.get(job_id)
+            if job and job.done and not any(job_id in ids for ids in self._sessions.values()):
+                del self._jobs[job_id]
+            return job
+
+    def _prune(self):
+        cutoff = time.monotonic() - JOB_RETENTION_SECONDS
+        expired = {job_id for job_id, job in self._jobs.items() if job.done and job.finished_at < cutoff}
+
+        for job_id in expired:
+            del self._jobs[job_id]
+        for session_id in list(self._sessions):
+            self._sessions[session_id] -= expired
+            if not self._sessions[session_id]:
+                del self._sessions[session_id]
+
+
+# Shared process-wide instance (survives Streamlit reruns)
+job_executor = JobExecutor()
@@ -0,0 +1,166 @@
+"""
+HTTP client for the patient data backend API.
+
+One keep-alive requests.Session (with a pooled adapter) is shared by the
+process. Every request has a timeout and is retried with backoff on
+connection errors, 429 and 5xx. Pages are requested with the ETag /
+Last-Modified validators of the previous response, so a page that hasn't
+changed comes back as an empty 304 and is served from memory.
+"""
+import os
+import threading
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from ttl_cache import TTLCache
+
+PATIENT_API_URL = "https://backend.qa.continuumcare.ai/api/llm/data"
+PATIENT_API_DEFAULT_USER_ID = 182
+PATIENT_API_PAGE_SIZE = 20
+# The page bodies use Spring Data's Page shape (content, totalPages, last),
+# and Spring numbers pages from 0 unless one-indexed parameters are switched
+# on. Starting at 1 against a 0-based backend would silently skip the first
+# `size` records, so 0 is the default; set PATIENT_API_FIRST_PAGE=1 for a
+# 1-based deployment.
+PATIENT_API_FIRST_PAGE = int(os.environ.get("PATIENT_API_FIRST_PAGE", 0))
+PATIENT_API_MAX_PAGES = 500
+
+# (connect, read) seconds
+PATIENT_API_TIMEOUT = (5, 30)
+
+# Keys the backend may use for the record list / page count in a page body
+RECORD_KEYS = ("data", "items", "results", "records", "content")
+TOTAL_PAGES_KEYS = ("total_pages", "totalPages", "pages")
+
+
+def _page_records(body):
+    """Extracts the list of records from one page body."""
+    if isinstance(body, list):
+        return body
+    if isinstance(body, dict):
+        for key in RECORD_KEYS:
+            if isinstance(body.get(key), list):
+                return body[key]
+    return []
+
+
+def _is_last_page(body):
+    """Spring's "last" flag, when the page body carries one."""
+    return isinstance(body, dict) and body.get("last") is True
+
+
+def _total_pages(body):
+    if isinstance(body, dict):
+        for key in TOTAL_PAGES_KEYS:
+            if isinstance(body.get(key), int):
+                return body[key]
+    return None
+
+
+class PatientDataClient:
+    """Pooled, retrying, conditional-GET client for patient records."""
+
+    def __init__(self, token, base_url=PATIENT_API_URL, page_size=PATIENT_API_PAGE_SIZE):
+        self.base_url = base_url
+        self.page_size = page_size
+
+        retry = Retry(
+            total=4,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(["GET"]),
+            respect_retry_after_header=True,
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Accept": "application/json",
+            "Authorization": f"Bearer {token}",
+        })
+
+        # (user_id, page) -> {"etag", "last_modified", "body"}
+        self._validated = TTLCache(ttl_seconds=24 * 60 * 60, max_entries=2048)
+
+    def get_page(self, user_id, page):
+        """Returns one page body, revalidating against the last copy if there is one."""
+        key = (user_id, page, self.page_size)
+        previous = self._validated.get(key)
+
+        headers = {}
+        if previous:
+            if previous["etag"]:
+                headers["If-None-Match"] = previous["etag"]
+            if previous["last_modified"]:
+                headers["If-Modified-Since"] = previous["last_modified"]
+
+        r = self.session.get(
+            self.base_url,
+            params={"user_id": user_id, "page": page, "size": self.page_size},
+            headers=headers,
+            timeout=PATIENT_API_TIMEOUT,
+        )
+
+        if r.status_code == 304 and previous:
+            print(f"Patient data page {page} for user {user_id}: not modified")
+            return previous["body"]
+
+        r.raise_for_status()
+        body = r.json()
+        print(f"Patient data page {page} for user {user_id}: {r.status_code}, {len(_page_records(body))} record(s)")
+
+        etag = r.headers.get("ETag")
+        last_modified = r.headers.get("Last-Modified")
+        if etag or last_modified:
+            self._validated.put(key, {"etag": etag, "last_modified": last_modified, "body": body})
+
+        return body
+
+    def iter_records(self, user_id):
+        """Yields every record for a user, fetching one page at a time."""
+        page = PATIENT_API_FIRST_PAGE
+
+        for _ in range(PATIENT_API_MAX_PAGES):
+            body = self.get_page(user_id, page)
+            records = _page_records(body)
+            yield from records
+
+            total_pages = _total_pages(body)
+            last_page = PATIENT_API_FIRST_PAGE + total_pages - 1 if total_pages is not None else None
+
+            if (
+                not records
+                or len(records) < self.page_size
+                or _is_last_page(body)
+                or (last_page is not None and page >= last_page)
+            ):
+                return
+            page += 1
+
+        print(f"⚠️ Stopped after {PATIENT_API_MAX_PAGES} pages of patient data for user {user_id}")
+
+    def fetch_all(self, user_id):
+        return list(self.iter_records(user_id))
+
+
+# ----------------------------------------------------------------------
+# Process-wide client
+# ----------------------------------------------------------------------
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_patient_client():
+    """Returns the shared PatientDataClient, creating it on first use."""
+    global _client
+
+    with _client_lock:
+        if _client is None:
+            _client = PatientDataClient(st.secrets["API_BEARER_TOKEN"])
+
+    return _client
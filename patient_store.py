@@ -0,0 +1,403 @@
+"""
+Local store of parsed patient measurements.
+
+Patient records (backend API pages, JSON files such as rajesh_malhotra.json)
+are flattened into one row per numeric measurement (blood pressure split into
+systolic/diastolic, cholesterol panels into ldl/hdl/total, weight, BMI, pulse,
+...) in SQLite, indexed per patient and metric. Records are streamed in: API
+pages are fetched one at a time, and JSON files are decoded record by record.
+Per-metric aggregates are recomputed on ingestion, so a metric question can
+carry a compact summary of the patient's readings alongside the raw files.
+
+A reading's time comes only from its record's own timestamp; readings without
+one are stored untimed rather than dated by when a file was last edited.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+PATIENT_STORE_PATH = os.environ.get("PATIENT_STORE_PATH", ".patient_store.sqlite3")
+
+RECENT_WINDOW_DAYS = 30
+
+# Backend records are re-ingested at most this often
+API_INGEST_INTERVAL_SECONDS = 5 * 60
+INSERT_BATCH_SIZE = 500
+
+# Keys that carry a record's timestamp, most specific first
+TIMESTAMP_KEYS = ("recorded_at", "measured_at", "timestamp", "date", "created_at", "updated_at")
+
+# Only string values under keys mentioning one of these are parsed as numbers
+METRIC_KEYWORDS = (
+    "bp", "blood_pressure", "systolic", "diastolic", "pulse", "heart_rate",
+    "weight", "bmi", "cholesterol", "ldl", "hdl", "triglyceride", "glucose",
+    "a1c", "steps", "sleep", "spo2", "temperature",
+)
+
+# Numeric fields that describe the patient or a change, not a reading
+NON_MEASUREMENT_KEYS = frozenset(("age", "height", "id", "user_id", "page", "size"))
+NON_MEASUREMENT_SUFFIXES = ("_change", "_id", "_unit")
+
+BP_PATTERN = re.compile(r"^\s*(\d{2,3})\s*/\s*(\d{2,3})")
+NUMBER_PATTERN = re.compile(r"^\s*(-?\d[\d,]*(?:\.\d+)?)\s*([A-Za-z%/]+)?")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS measurements (
+    patient TEXT NOT NULL,
+    source TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL NOT NULL,
+    unit TEXT,
+    recorded_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_measurements_patient_metric
+    ON measurements (patient, metric, recorded_at);
+
+CREATE TABLE IF NOT EXISTS sources (
+    patient TEXT NOT NULL,
+    source TEXT NOT NULL,
+    version TEXT,
+    PRIMARY KEY (patient, source)
+);
+
+CREATE TABLE IF NOT EXISTS aggregates (
+    patient TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    unit TEXT,
+    n INTEGER,
+    latest_value REAL,
+    latest_at TEXT,
+    min_value REAL,
+    max_value REAL,
+    mean_value REAL,
+    recent_mean REAL,
+    PRIMARY KEY (patient, metric)
+);
+"""
+
+
+# ----------------------------------------------------------------------
+# Parsing
+# ----------------------------------------------------------------------
+def _is_metric_key(key):
+    key = key.lower()
+    return any(word in key for word in METRIC_KEYWORDS)
+
+
+def _is_non_measurement_key(key):
+    key = key.lower()
+    return key in NON_MEASUREMENT_KEYS or key.endswith(NON_MEASUREMENT_SUFFIXES)
+
+
+def _record_timestamp(record, default):
+    for key in TIMESTAMP_KEYS:
+        value = record.get(key)
+        if isinstance(value, str) and value:
+            return value
+    return default
+
+
+def parse_measurements(record, recorded_at=None, prefix=""):
+    """
+    Yields (metric, value, unit, recorded_at) for every numeric measurement
+    in a (possibly nested) record.
+    """
+    if not isinstance(record, dict):
+        return
+
+    recorded_at = _record_timestamp(record, recorded_at)
+
+    for key, value in record.items():
+        metric = f"{prefix}{key}"
+
+        if isinstance(value, bool) or key in TIMESTAMP_KEYS or _is_non_measurement_key(key):
+            continue
+
+        if isinstance(value, (int, float)):
+            yield metric, float(value), None, recorded_at
+
+        elif isinstance(value, dict):
+            yield from parse_measurements(value, recorded_at, prefix=f"{metric}.")
+
+        elif isinstance(value, list):
+            for item in value:
+                yield from parse_measurements(item, recorded_at, prefix=f"{metric}.")
+
+        elif isinstance(value, str) and _is_metric_key(metric):
+            if "bp" in metric.lower() or "pressure" in metric.lower():
+                # Only a plain "120/80" reading; ranges and changes are skipped
+                bp = BP_PATTERN.match(value)
+                if bp:
+                    yield f"{metric}.systolic", float(bp.group(1)), "mmHg", recorded_at
+                    yield f"{metric}.diastolic", float(bp.group(2)), "mmHg", recorded_at
+                continue
+
+            number = NUMBER_PATTERN.match(value)
+            if number:
+                yield metric, float(number.group(1).replace(",", "")), number.group(2), recorded_at
+
+
+# ----------------------------------------------------------------------
+# Store
+# ----------------------------------------------------------------------
+class PatientStore:
+    """SQLite-backed measurement store with per-patient aggregates."""
+
+    def __init__(self, path=PATIENT_STORE_PATH):
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+
+    def source_version(self, patient, source):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT version FROM sources WHERE patient = ? AND source = ?",
+                (patient, source),
+            ).fetchone()
+        return row[0] if row else None
+
+    def retain_sources(self, patient, sources):
+        """Drops a patient's rows from every source not in `sources` (e.g. deleted files)."""
+        sources = set(sources)
+
+        with self._lock, self._db:
+            stale = [
+                row[0] for row in self._db.execute(
+                    "SELECT source FROM sources WHERE patient = ?", (patient,)
+                ).fetchall()
+                if row[0] not in sources
+            ]
+            if not stale:
+                return
+
+            for source in stale:
+                self._db.execute(
+                    "DELETE FROM measurements WHERE patient = ? AND source = ?", (patient, source)
+                )
+                self._db.execute(
+                    "DELETE FROM sources WHERE patient = ? AND source = ?", (patient, source)
+                )
+            self._refresh_aggregates(patient)
+
+        print(f"🗄️ Dropped {len(stale)} stale source(s) for {patient}")
+
+    def ingest(self, patient, source, records, version=None):
+        """
+        Replaces everything previously ingested from `source` with the
+        measurements in `records` (any iterable, consumed in batches), then
+        refreshes the patient's aggregates. Returns the number of rows stored.
+        """
+        stored = 0
+
+        with self._lock, self._db:
+            self._db.execute(
+                "DELETE FROM measurements WHERE patient = ? AND source = ?",
+                (patient, source),
+            )
+
+            batch = []
+            for record in records:
+                for metric, value, unit, recorded_at in parse_measurements(record):
+                    batch.append((patient, source, metric, value, unit, recorded_at))
+
+                if len(batch) >= INSERT_BATCH_SIZE:
+                    self._insert(batch)
+                    stored += len(batch)
+                    batch = []
+
+            self._insert(batch)
+            stored += len(batch)
+
+            self._db.execute(
+                "INSERT OR REPLACE INTO sources (patient, source, version) VALUES (?, ?, ?)",
+                (patient, source, version),
+            )
+            self._refresh_aggregates(patient)
+
+        print(f"🗄️ Ingested {stored} measurement(s) for {patient} from {source}")
+        return stored
+
+    def _insert(self, rows):
+        if rows:
+            self._db.executemany(
+                "INSERT INTO measurements (patient, source, metric, value, unit, recorded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+
+    def _refresh_aggregates(self, patient):
+        self._db.execute("DELETE FROM aggregates WHERE patient = ?", (patient,))
+        self._db.execute(
+            """
+            INSERT INTO aggregates
+                (patient, metric, unit, n, latest_at, min_value, max_value, mean_value)
+            SELECT patient, metric, MAX(unit), COUNT(*), MAX(recorded_at),
+                   MIN(value), MAX(value), AVG(value)
+            FROM measurements
+            WHERE patient = ?
+            GROUP BY metric
+            """,
+            (patient,),
+        )
+
+        # Latest value, and mean over the window ending at the latest reading
+        for metric, latest_at in self._db.execute(
+            "SELECT metric, latest_at FROM aggregates WHERE patient = ?", (patient,)
+        ).fetchall():
+            latest_value = self._db.execute(
+                "SELECT value FROM measurements WHERE patient = ? AND metric = ? "
+                "ORDER BY recorded_at DESC LIMIT 1",
+                (patient, metric),
+            ).fetchone()[0]
+
+            recent_mean = None
+            window_start = _window_start(latest_at)
+            if window_start:
+                recent_mean = self._db.execute(
+                    "SELECT AVG(value) FROM measurements WHERE patient = ? AND metric = ? "
+                    "AND recorded_at >= ?",
+                    (patient, metric, window_start),
+                ).fetchone()[0]
+
+            self._db.execute(
+                "UPDATE aggregates SET latest_value = ?, recent_mean = ? "
+                "WHERE patient = ? AND metric = ?",
+                (latest_value, recent_mean, patient, metric),
+            )
+
+    def aggregates(self, patient):
+        with self._lock:
+            cursor = self._db.execute(
+                "SELECT metric, unit, n, latest_value, latest_at, min_value, max_value, "
+                "mean_value, recent_mean FROM aggregates WHERE patient = ? ORDER BY metric",
+                (patient,),
+            )
+            columns = [c[0] for c in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def metrics_summary(self, patient, min_readings=2):
+        """
+        Compact text table of the patient's metrics with at least
+        `min_readings` readings ("" if none), i.e. the series that a summary
+        actually condenses; one-off values are already in the raw records.
+        """
+        rows = [r for r in self.aggregates(patient) if r["n"] >= min_readings]
+        if not rows:
+            return ""
+
+        lines = [
+            f"metric | unit | latest (at) | min | max | mean | {RECENT_WINDOW_DAYS}-day mean | readings"
+        ]
+        for r in rows:
+            recent = f"{r['recent_mean']:g}" if r["recent_mean"] is not None else "-"
+            lines.append(
+                f"{r['metric']} | {r['unit'] or '-'} | {r['latest_value']:g} ({r['latest_at'] or '-'}) | "
+                f"{r['min_value']:g} | {r['max_value']:g} | {r['mean_value']:.4g} | {recent} | {r['n']}"
+            )
+        return "\n".join(lines)
+
+
+def _window_start(latest_at):
+    """ISO timestamp RECENT_WINDOW_DAYS before `latest_at`, or None if unparseable."""
+    if not latest_at:
+        return None
+    try:
+        latest = datetime.fromisoformat(latest_at.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    return (latest - timedelta(days=RECENT_WINDOW_DAYS)).isoformat()
+
+
+# ----------------------------------------------------------------------
+# Ingestion helpers
+# ----------------------------------------------------------------------
+def iter_json_records(text):
+    """
+    Yields the records of a JSON document one at a time: the elements of a
+    top-level array, each object of a JSON Lines / concatenated stream, or
+    the single top-level object. Raises ValueError on malformed input.
+    """
+    decoder = json.JSONDecoder()
+    end = len(text)
+    pos = _skip_whitespace(text, 0)
+
+    in_array = text.startswith("[", pos)
+    if in_array:
+        pos = _skip_whitespace(text, pos + 1)
+        if text.startswith("]", pos):
+            return
+
+    while pos < end:
+        record, pos = decoder.raw_decode(text, pos)
+        yield record
+        pos = _skip_whitespace(text, pos)
+
+        if in_array:
+            if text.startswith("]", pos):
+                return
+            if not text.startswith(",", pos):
+                raise ValueError(f"Expected ',' or ']' at position {pos}")
+            pos = _skip_whitespace(text, pos + 1)
+
+    if in_array:
+        raise ValueError("Unterminated JSON array")
+
+
+def _skip_whitespace(text, pos):
+    while pos < len(text) and text[pos] in " \t\r\n":
+        pos += 1
+    return pos
+
+
+def ingest_json_file(store, patient, file, text):
+    """
+    Ingests a Drive JSON patient file unless this version is already stored.
+    Returns the number of rows stored, or None if the text isn't JSON.
+    """
+    version = file.get("md5Checksum") or file.get("modifiedTime")
+    if version is not None and store.source_version(patient, file["id"]) == version:
+        return 0
+
+    if not text.lstrip().startswith(("{", "[")):
+        return None
+
+    try:
+        return store.ingest(patient, file["id"], iter_json_records(text), version=version)
+    except ValueError:
+        # Malformed JSON: the ingest transaction was rolled back
+        return None
+
+
+def ingest_api_records(store, patient, user_id, max_age_seconds=API_INGEST_INTERVAL_SECONDS):
+    """
+    Streams every page of a user's backend records into the store, unless
+    they were ingested less than `max_age_seconds` ago. Returns the number of
+    rows stored, or None if the previous ingestion is still fresh.
+    """
+    from patient_api import get_patient_client
+
+    ingested_at = store.source_version(patient, "api")
+    if ingested_at and time.time() - float(ingested_at) < max_age_seconds:
+        return None
+
+    return store.ingest(
+        patient, "api", get_patient_client().iter_records(user_id), version=str(time.time())
+    )
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_patient_store():
+    global _store
+
+    with _store_lock:
+        if _store is None:
+            _store = PatientStore()
+
+    return _store
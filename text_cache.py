@@ -0,0 +1,137 @@
+"""
+On-disk cache for plain text extracted from Drive files.
+
+Entries are keyed by Drive file id plus a content version (md5Checksum when
+Drive has one, otherwise modifiedTime), so an edited file simply misses the
+cache and is downloaded again. The cache directory is bounded in size and the
+least recently used entries are evicted first.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+TEXT_CACHE_DIR = os.environ.get("TEXT_CACHE_DIR", ".text_cache")
+TEXT_CACHE_MAX_BYTES = int(os.environ.get("TEXT_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+
+class TextCache:
+    """Size-bounded LRU cache of extracted text, persisted across restarts."""
+
+    def __init__(self, directory=TEXT_CACHE_DIR, max_bytes=TEXT_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries = None  # filename -> size in bytes, oldest first
+        self._total_bytes = 0
+
+    # ------------------------------------------------------------------
+    # Internal helpers (call with the lock held)
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _filename(file_id, version):
+        digest = hashlib.sha256(str(version).encode("utf-8")).hexdigest()[:16]
+        return f"{file_id}.{digest}.txt"
+
+    def _load_index(self):
+        if self._entries is not None:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        found = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".txt"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            found.append((stat.st_mtime, name, stat.st_size))
+
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        for _, name, size in sorted(found):
+            self._entries[name] = size
+            self._total_bytes += size
+
+    def _remove(self, name):
+        size = self._entries.pop(name, 0)
+        self._total_bytes -= size
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except OSError:
+            pass
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and self._entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+    def get(self, file_id, version):
+        """Returns cached text for this file version, or None on a miss."""
+        name = self._filename(file_id, version)
+        path = os.path.join(self.directory, name)
+
+        with self._lock:
+            self._load_index()
+            if name not in self._entries:
+                return None
+            self._entries.move_to_end(name)
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+            os.utime(path)
+            return text
+        except OSError:
+            with self._lock:
+                self._remove(name)
+            return None
+
+    def put(self, file_id, version, text):
+        """Stores text for this file version, replacing any older version."""
+        name = self._filename(file_id, version)
+        path = os.path.join(self.directory, name)
+        data = text.encode("utf-8")
+
+        with self._lock:
+            self._load_index()
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"Error writing text cache entry for {file_id}: {e}")
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                return
+
+            for stale in [n for n in self._entries if n.startswith(f"{file_id}.") and n != name]:
+                self._remove(stale)
+
+            self._total_bytes -= self._entries.pop(name, 0)
+            self._entries[name] = len(data)
+            self._total_bytes += len(data)
+            self._evict()
+
+    def invalidate(self, file_id):
+        """Drops every cached version of a file."""
+        with self._lock:
+            self._load_index()
+            for name in [n for n in self._entries if n.startswith(f"{file_id}.")]:
+                self._remove(name)
+
+    def clear(self):
+        """Drops every cached entry."""
+        with self._lock:
+            self._load_index()
+            for name in list(self._entries):
+                self._remove(name)
+
+
+# Shared process-wide instance
+text_cache = TextCache()
@@ -0,0 +1,179 @@
+"""
+Background warm-up of the preset-question answers.
+
+When the synced Drive index sees patient data change (a polled edit, or an
+upload through upload_file), every preset question is answered again in the
+background and stored in the answer cache, so the first click after new data
+lands is served instantly. Changes arriving close together are debounced into
+one run, and a change during a run schedules one more run after it.
+
+WARMUP_MODE picks how answers are produced:
+  "direct": each question is asked through the app's job executor, so a user
+            clicking a preset mid-warm-up joins the run in flight, and
+            answers still cached for unchanged inputs cost nothing.
+  "batch":  the requests are prepared locally and sent together through the
+            Message Batches API, at half the price but with results that may
+            take minutes to arrive (clicks meanwhile run their own pipeline).
+"""
+import os
+import threading
+import time
+
+from drive_sync import get_drive_sync
+
+WARMUP_MODE = os.environ.get("WARMUP_MODE", "direct")
+
+# Session the warm-up's Jobs are tracked under in the job executor
+WARMUP_SESSION_ID = "warmup"
+
+# Quiet period after the last change before warming up
+WARMUP_DELAY_SECONDS = 20
+
+BATCH_POLL_SECONDS = 30
+BATCH_TIMEOUT_SECONDS = 60 * 60
+
+
+class WarmupScheduler:
+    """Debounced background re-answering of the preset questions."""
+
+    def __init__(self, delay_seconds=WARMUP_DELAY_SECONDS, mode=WARMUP_MODE):
+        self.delay_seconds = delay_seconds
+        self.mode = mode
+
+        self._lock = threading.Lock()
+        self._timer = None
+        self._running = False
+        self._rerun = False
+
+    def on_files_changed(self, files):
+        """Drive sync listener: schedules a warm-up when patient data changed."""
+        if any(f.get("source") == "patient_data" for f in files):
+            self.schedule()
+
+    def schedule(self):
+        """(Re)starts the quiet-period timer, or queues a rerun if one is running."""
+        with self._lock:
+            if self._running:
+                self._rerun = True
+                return
+
+            if self._timer:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.delay_seconds, self._run)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _run(self):
+        with self._lock:
+            self._timer = None
+            self._running = True
+
+        try:
+            self.warm()
+        except Exception as e:
+            print(f"Error warming preset answers: {e}")
+
+        finally:
+            with self._lock:
+                self._running = False
+                rerun, self._rerun = self._rerun, False
+
+            if rerun:
+                self.schedule()
+
+    def warm(self):
+        """Answers every preset question whose cached answer is missing or stale."""
+        # Imported here: workflow builds its clients at import time
+        from jobs import job_executor
+        from workflow import PRESET_QUESTIONS
+
+        print(f"🔥 Warming preset answers ({self.mode})...")
+        started = time.monotonic()
+
+        if self.mode == "batch":
+            self._warm_batch()
+        else:
+            # One at a time, so a warm-up never crowds out user requests
+            for question in PRESET_QUESTIONS:
+                try:
+                    job_executor.answer(WARMUP_SESSION_ID, question)
+                except Exception as e:
+                    print(f"Error warming answer for {question!r}: {e}")
+
+        print(f"🔥 Preset answers warm in {time.monotonic() - started:.1f}s")
+
+    def _warm_batch(self):
+        from workflow import (
+            FINAL_MAX_TOKENS,
+            FINAL_MODEL,
+            PRESET_QUESTIONS,
+            cached_answer,
+            client,
+            prepare_final_request,
+            request_key,
+            store_answer,
+        )
+
+        all_files = get_drive_sync().list_files()
+
+        keys, batch_requests = {}, []
+        for i, question in enumerate(PRESET_QUESTIONS):
+            key = request_key(question, all_files)
+            if cached_answer(key) is not None:
+                continue
+
+            custom_id = f"preset-{i}"
+            keys[custom_id] = key
+            batch_requests.append({
+                "custom_id": custom_id,
+                "params": {
+                    "model": FINAL_MODEL,
+                    "max_tokens": FINAL_MAX_TOKENS,
+                    **prepare_final_request(question, all_files),
+                },
+            })
+
+        if not batch_requests:
+            return
+
+        batch = client.messages.batches.create(requests=batch_requests)
+        print(f"📦 Submitted warm-up batch {batch.id} ({len(batch_requests)} question(s))")
+
+        deadline = time.monotonic() + BATCH_TIMEOUT_SECONDS
+        while batch.processing_status != "ended":
+            if time.monotonic() > deadline:
+                print(f"⚠️ Warm-up batch {batch.id} timed out; cancelling.")
+                client.messages.batches.cancel(batch.id)
+                return
+            time.sleep(BATCH_POLL_SECONDS)
+            batch = client.messages.batches.retrieve(batch.id)
+
+        for entry in client.messages.batches.results(batch.id):
+            if entry.result.type == "succeeded":
+                store_answer(keys[entry.custom_id], entry.result.message.content[0].text)
+            else:
+                print(f"Warm-up batch request {entry.custom_id}: {entry.result.type}")
+
+
+# ----------------------------------------------------------------------
+# Process-wide instance
+# ----------------------------------------------------------------------
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_warmup_scheduler():
+    """
+    Returns the shared WarmupScheduler. On first use it subscribes to Drive
+    sync and schedules one warm-up, to catch changes made while the app was
+    down.
+    """
+    global _scheduler
+
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = WarmupScheduler()
+            get_drive_sync().add_listener(_scheduler.on_files_changed)
+            _scheduler.schedule()
+
+    return _scheduler
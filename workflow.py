@@ -1,116 +1,89 @@
-from anthropic import Anthropic
+from anthropic import Anthropic, AsyncAnthropic
+import asyncio
 import io
+import json
 import os
+import re
+import threading
+from collections import Counter
 import streamlit as st
 from rapidfuzz import fuzz
-import requests
 
 
 from drive_manager import (
     list_data_files,
     get_drive_service,
-    api_get_files_in_folder,
-    api_get_file_content,
+    files_from_source,
+    fingerprint_files,
+    fingerprint_file_revisions,
+    get_files_text,
+    submit_file_text,
     FOLDER_ID_PROMPT_FRAMEWORK,
     get_guideline_filenames
 )
+from drive_sync import get_drive_sync
+from framework_registry import framework_registry
+from ttl_cache import TTLCache
+from guideline_index import get_guideline_index
+from context_assembler import ContextBudget
+from patient_api import PATIENT_API_DEFAULT_USER_ID, get_patient_client
+from patient_store import get_patient_store, ingest_api_records, ingest_json_file
+from answer_cache import get_answer_cache, inputs_digest
 client = Anthropic(api_key=st.secrets["ANTHROPIC_API_KEY"])
+async_client = AsyncAnthropic(api_key=st.secrets["ANTHROPIC_API_KEY"])
 
-#For pulling data from postgres api
-def fetch_patient_data():
-    print("Calling patient data API...")
-
-    url = "https://backend.qa.continuumcare.ai/api/llm/data?user_id=182&page=2&size=20"
-
-    headers = {
-        "Accept": "application/json",
-        "Authorization": f"Bearer {st.secrets['API_BEARER_TOKEN']}"
-    }
+# The async pipeline runs on one long-lived event loop in a background thread:
+# AsyncAnthropic's connection pool is tied to the loop it was first used on,
+# so a fresh asyncio.run() per call would throw the pool away each time.
+_event_loop = asyncio.new_event_loop()
+threading.Thread(target=_event_loop.run_forever, name="workflow-loop", daemon=True).start()
 
-    try:
-        r = requests.get(url, headers=headers)
-        print("Status:", r.status_code)
-        print("Queried URL:", url)
-        print("Raw text:", r.text[:200])
-
-        return r.json()
 
-    except Exception as e:
-        print("Error:", e)
-        return None
+def run_sync(coro):
+    """Run a coroutine on the pipeline's event loop and wait for its result."""
+    return asyncio.run_coroutine_threadsafe(coro, _event_loop).result()
 
+# Model and output limit for the final answer
+FINAL_MODEL = "claude-sonnet-4-20250514"
+FINAL_MAX_TOKENS = 2000
 
-def fetch_patient_data_by_id(_):
-    print("Fetching HARD-CODED patient URL...")
+# "retrieval": top-k passages from the local guideline index (no selector call)
+# "selector": Claude picks whole guideline files by name
+GUIDELINE_MODE = os.environ.get("GUIDELINE_MODE", "retrieval")
 
-    url = "https://backend.qa.continuumcare.ai/api/llm/data?user_id=182&page=2&size=20"
-
-    headers = {
-        "Accept": "application/json",
-        "Authorization": f"Bearer {st.secrets['API_BEARER_TOKEN']}"
-    }
+#For pulling data from postgres api
+def fetch_patient_data(user_id=PATIENT_API_DEFAULT_USER_ID):
+    """Every patient record for a user, across all pages (None on error)."""
+    print("Calling patient data API...")
 
     try:
-        r = requests.get(url, headers=headers)
-        print("Status:", r.status_code)
-        print("Queried URL:", url)
-        print("Raw text:", r.text[:200])
-
-        return r.json()
+        return get_patient_client().fetch_all(user_id)
 
     except Exception as e:
         print("Error:", e)
         return None
 
 
-def load_frameworks():
-    """Load all framework files, extract function names, and show detailed logs."""
+def fetch_patient_data_by_id(user_id):
+    return fetch_patient_data(user_id)
+
+
+def load_frameworks(all_files=None):
+    """Return all frameworks from the registry, refreshing only changed files."""
     print("\n========================")
     print(" Loading framework files...")
     print("========================\n")
 
-    service = get_drive_service()
-
     print(" Framework folder ID:", FOLDER_ID_PROMPT_FRAMEWORK)
 
-    # Get files in the framework folder
-    framework_files = api_get_files_in_folder(service, FOLDER_ID_PROMPT_FRAMEWORK)
+    # Get files in the framework folder (from the turn's inventory snapshot)
+    if all_files is None:
+        all_files = list_data_files()
+    framework_files = files_from_source(all_files, "prompt_framework")
 
     print("Files returned from Drive:", [f["name"] for f in framework_files])
 
-    frameworks = []
-
-    for f in framework_files:
-        print("\n--------------------------------")
-        print(" Reading file:", f["name"])
-        print("--------------------------------")
-
-        # Load full content
-        content = api_get_file_content(service, f["id"], f["mimeType"])
-
-        if not content:
-            print("⚠️ File content EMPTY or unreadable.")
-            continue
-
-        # Extract first line
-        first_line = content.split("\n")[0]
-        print(" Raw first line:", repr(first_line))
-
-        # Remove BOM + whitespace
-        clean_first_line = first_line.lstrip("\ufeff").strip()
-        print(" Cleaned first line:", repr(clean_first_line))
-
-        # Check for Function header
-        if clean_first_line.lower().startswith("function:"):
-            function_name = clean_first_line.replace("Function:", "").strip()
-            print("✅ Framework detected. Function name:", function_name)
-
-            frameworks.append({
-                "name": function_name,
-                "content": content
-            })
-        else:
-            print("This file does NOT start with 'Function:' — skipped.")
+    frameworks = framework_registry.refresh(framework_files)
 
     print("\n Total frameworks loaded:", len(frameworks))
     print("========================\n")
@@ -138,45 +111,73 @@ def choose_best_framework(user_query, frameworks):
 
 
 # ---------------------------------------------------------
-# MAIN RESPONSE GENERATOR
+# PROMPT CACHING
 # ---------------------------------------------------------
-def generate_response(user_query):
-    print("\n🔍 Starting generate_response()")
-    service = get_drive_service()
-    all_files = list_data_files()
+prompt_cache_stats = {
+    "requests": 0,
+    "hits": 0,
+    "misses": 0,
+    "cache_read_input_tokens": 0,
+    "cache_creation_input_tokens": 0,
+    "input_tokens": 0,
+}
+_prompt_cache_stats_lock = threading.Lock()
+
+
+def cached_text_block(text):
+    """A text content block marked as a prompt-cache breakpoint."""
+    return {"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}
+
+
+def record_cache_usage(usage):
+    """Accumulate prompt-cache hit/miss counts from a response's usage field."""
+    cache_read = getattr(usage, "cache_read_input_tokens", 0) or 0
+    cache_creation = getattr(usage, "cache_creation_input_tokens", 0) or 0
+
+    with _prompt_cache_stats_lock:
+        prompt_cache_stats["requests"] += 1
+        prompt_cache_stats["hits" if cache_read else "misses"] += 1
+        prompt_cache_stats["cache_read_input_tokens"] += cache_read
+        prompt_cache_stats["cache_creation_input_tokens"] += cache_creation
+        prompt_cache_stats["input_tokens"] += usage.input_tokens
+
+    print(
+        f"💾 Prompt cache: read={cache_read} created={cache_creation} "
+        f"uncached={usage.input_tokens} "
+        f"(hits {prompt_cache_stats['hits']}/{prompt_cache_stats['requests']})"
+    )
 
-    # 1. Load & match framework
-    frameworks = load_frameworks()
-    best_fw = choose_best_framework(user_query, frameworks)
 
-    chosen_framework_name = best_fw["name"]
-    framework_text = best_fw["content"]
+# ---------------------------------------------------------
+# GUIDELINE SELECTOR (memoized per patient data fingerprint)
+# ---------------------------------------------------------
+SELECTOR_CACHE_TTL_SECONDS = 6 * 60 * 60
+SELECTOR_CACHE_MAX_ENTRIES = 256
 
-    print(f"🧠 Chosen Framework: {chosen_framework_name}")
+selector_cache = TTLCache(SELECTOR_CACHE_TTL_SECONDS, SELECTOR_CACHE_MAX_ENTRIES)
 
-    system_prompt = f"""
-You MUST strictly follow the framework below. 
-Do not ignore, modify, or override any part of it.
 
-=== FRAMEWORK START: {chosen_framework_name} ===
-{framework_text}
-=== FRAMEWORK END ===
-"""
+def normalize_query(user_query):
+    """Lowercase, drop punctuation/emoji and collapse whitespace."""
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", user_query.lower()).split())
 
-    # ----------------------------------------------------------
-    # 2. LOAD PATIENT DATA FIRST (IMPORTANT!)
-    # ----------------------------------------------------------
-    patient_text = ""
-    for f in all_files:
-        if f.get("source") == "patient_data":
-            content = api_get_file_content(service, f["id"], f["mimeType"])
-            patient_text += f"\n\n---\nPATIENT FILE: {f['name']}\n{content}"
 
-    # ----------------------------------------------------------
-    # 3. GUIDELINE SELECTION (FILENAMES + PATIENT DATA)
-    # ----------------------------------------------------------
-    guideline_files = get_guideline_filenames()
-    filename_list = [f["name"] for f in guideline_files]
+async def select_guidelines(user_query, patient_files, patient_text, filename_list):
+    """
+    Ask Claude which guideline files fit the patient's issues.
+    The answer is memoized on (patient file ids + versions, guideline list,
+    normalized query), so repeat questions on unchanged data skip the call.
+    """
+    cache_key = (
+        fingerprint_files(patient_files),
+        tuple(sorted(filename_list)),
+        normalize_query(user_query),
+    )
+
+    cached = selector_cache.get(cache_key)
+    if cached is not None:
+        print("♻️ Reusing cached guideline selection:", cached)
+        return cached
 
     selector_prompt = f"""
 You are the guideline selector for a health summarization system.
@@ -206,7 +207,7 @@ Example:
 
     print("📁 Asking Claude to select relevant guideline filenames...")
 
-    selector_resp = client.messages.create(
+    selector_resp = await async_client.messages.create(
         model="claude-sonnet-4-20250514",
         max_tokens=300,
         messages=[{"role": "user", "content": selector_prompt}]
@@ -215,48 +216,388 @@ Example:
     raw_json = selector_resp.content[0].text
     print("🔍 Claude selector output:", raw_json)
 
-    import json
     try:
         selected_filenames = json.loads(raw_json)
     except:
-        selected_filenames = filename_list[:3]   # safe fallback
+        return filename_list[:3]   # safe fallback (not cached)
+
+    selector_cache.put(cache_key, selected_filenames)
+    return selected_filenames
+
+
+# ---------------------------------------------------------
+# SPECULATIVE GUIDELINE PREFETCH
+# ---------------------------------------------------------
+PREFETCH_TOP_K = 3
+
+# Patient key -> Counter of guideline filenames the selector picked
+_guideline_history = TTLCache(ttl_seconds=30 * 24 * 60 * 60, max_entries=1024)
+_global_guideline_history = Counter()
+_guideline_history_lock = threading.Lock()
+
+
+def patient_history_key(patient_files):
+    """Identifies a patient by their file ids (not versions, so edits keep history)."""
+    return fingerprint_files([{"id": f["id"]} for f in patient_files])
+
+
+def record_guideline_selection(patient_key, selected_filenames):
+    with _guideline_history_lock:
+        counts = _guideline_history.get(patient_key) or Counter()
+        counts.update(selected_filenames)
+        _guideline_history.put(patient_key, counts)
+        _global_guideline_history.update(selected_filenames)
+
+
+def predict_guidelines(patient_key, guideline_files, k=PREFETCH_TOP_K):
+    """
+    The guideline files most often selected for this patient, falling back
+    to the most often selected overall for a patient with no history yet.
+    """
+    with _guideline_history_lock:
+        counts = _guideline_history.get(patient_key) or _global_guideline_history
+        likely = [name for name, _ in counts.most_common(k)]
+
+    by_name = {f["name"]: f for f in guideline_files}
+    return [by_name[name] for name in likely if name in by_name]
+
+
+# ---------------------------------------------------------
+# PRECOMPUTED PATIENT METRICS
+# ---------------------------------------------------------
+# Whole words only, so e.g. "am I reading this right" doesn't count
+METRICS_QUERY_WORDS = {
+    "metric", "metrics", "vitals", "readings", "numbers", "trend", "trends",
+}
+
+
+def is_metrics_query(user_query):
+    return any(word in METRICS_QUERY_WORDS for word in normalize_query(user_query).split())
+
+
+# The app serves one patient: backend user PATIENT_API_DEFAULT_USER_ID, whose
+# Drive files are the patient folder. Keying the store on that id means an
+# upload adds a source to the same patient rather than creating a new one.
+PATIENT_STORE_KEY = f"user-{PATIENT_API_DEFAULT_USER_ID}"
+
+
+def patient_metric_items(patient_files, patient_contents):
+    """
+    Patient data items for a metric question: every patient file as text,
+    preceded by a summary of the patient's measurement series when there is
+    one. JSON patient files and the backend's records are streamed into the
+    patient store to build it.
+    """
+    store = get_patient_store()
+
+    items = [
+        (f"\n\n---\nPATIENT FILE: {f['name']}\n", content)
+        for f, content in zip(patient_files, patient_contents)
+    ]
+
+    for f, content in zip(patient_files, patient_contents):
+        if content:
+            ingest_json_file(store, PATIENT_STORE_KEY, f, content)
+
+    try:
+        ingest_api_records(store, PATIENT_STORE_KEY, PATIENT_API_DEFAULT_USER_ID)
+    except Exception as e:
+        print("Error ingesting backend patient records:", e)
 
-    print("📌 Selected guideline files:", selected_filenames)
+    # Rows from files no longer in the patient folder stop counting
+    store.retain_sources(PATIENT_STORE_KEY, [f["id"] for f in patient_files] + ["api"])
+
+    summary = store.metrics_summary(PATIENT_STORE_KEY)
+    if not summary:
+        return items
+
+    print("📊 Adding precomputed metrics summary")
+    header = "\n\n---\nPATIENT METRICS SUMMARY (precomputed from the patient records)\n"
+    return [(header, summary)] + items
+
+
+# ---------------------------------------------------------
+# REQUEST KEYS (coalescing and answer cache)
+# ---------------------------------------------------------
+def request_key(user_query, all_files):
+    """
+    Identity of a request: the normalized question plus fingerprints of the
+    framework, patient data and guideline files it is answered from (content
+    hash and modifiedTime). The chosen framework is a pure function of the
+    question and the framework files, so their fingerprint stands in for it.
+    """
+    return (
+        normalize_query(user_query),
+        fingerprint_file_revisions(files_from_source(all_files, "prompt_framework")),
+        fingerprint_file_revisions(files_from_source(all_files, "patient_data")),
+        fingerprint_file_revisions(get_guideline_filenames(all_files)),
+    )
+
+
+# ---------------------------------------------------------
+# ANSWER CACHE (preset questions)
+# ---------------------------------------------------------
+PRESET_QUESTIONS = [
+    "Prepare me for my doctor's visit",
+    "What's my health summary?",
+    "What should I ask my doctor?",
+    "Summarize my recent metrics",
+]
+
+_preset_queries = {normalize_query(q) for q in PRESET_QUESTIONS}
+
+
+def cached_answer(key):
+    """The stored answer for a preset question's request key, or None."""
+    if key[0] not in _preset_queries:
+        return None
+
+    try:
+        return get_answer_cache().get(key[0], inputs_digest(key[1:]))
+    except Exception as e:
+        print("Answer cache read failed:", e)
+        return None
+
+
+def store_answer(key, answer):
+    """Stores a finished answer if the request key is a preset question's."""
+    if key[0] not in _preset_queries or not answer:
+        return
+
+    try:
+        get_answer_cache().put(key[0], inputs_digest(key[1:]), answer)
+    except Exception as e:
+        print("Answer cache write failed:", e)
+
+
+# ---------------------------------------------------------
+# MAIN RESPONSE GENERATOR
+# ---------------------------------------------------------
+async def aprepare_final_request(user_query, all_files=None):
+    """
+    Runs the pipeline up to the final Claude call (framework match, patient
+    data, guideline selection) and returns the system prompt and messages.
+    Independent stages (framework loading, patient data fetching, guideline
+    index loading) run concurrently; blocking Drive and CPU work happens on
+    worker threads.
+    """
+    print("\n🔍 Starting generate_response()")
+    service = await asyncio.to_thread(get_drive_service)
+    if all_files is None:
+        all_files = await asyncio.to_thread(get_drive_sync().list_files)
+    budget = ContextBudget()
+
+    patient_files = files_from_source(all_files, "patient_data")
+    guideline_files = get_guideline_filenames(all_files)
+
+    stages = [
+        asyncio.to_thread(load_frameworks, all_files),
+        asyncio.to_thread(get_files_text, service, patient_files),
+    ]
+    if GUIDELINE_MODE == "retrieval":
+        stages.append(asyncio.to_thread(get_guideline_index, guideline_files, service))
+
+    results = await asyncio.gather(*stages)
+    frameworks, patient_contents = results[0], results[1]
+    guideline_index = results[2] if GUIDELINE_MODE == "retrieval" else None
+
+    # 1. Match framework
+    best_fw = choose_best_framework(user_query, frameworks)
+
+    chosen_framework_name = best_fw["name"]
+    framework_text = budget.fit("framework", [("", best_fw["content"])])
+
+    print(f"🧠 Chosen Framework: {chosen_framework_name}")
+
+    system_prompt = f"""
+You MUST strictly follow the framework below. 
+Do not ignore, modify, or override any part of it.
+
+=== FRAMEWORK START: {chosen_framework_name} ===
+{framework_text}
+=== FRAMEWORK END ===
+"""
 
     # ----------------------------------------------------------
-    # 4. LOAD ONLY SELECTED GUIDELINE TEXT
+    # 2. LOAD PATIENT DATA FIRST (IMPORTANT!)
     # ----------------------------------------------------------
-    selected_guideline_text = ""
+    # Newest files first, so older ones are the first trimmed when over budget
+    patient_items = [
+        (f"\n\n---\nPATIENT FILE: {f['name']}\n", content)
+        for f, content in zip(patient_files, patient_contents)
+    ]
+
+    if is_metrics_query(user_query):
+        patient_items = await asyncio.to_thread(
+            patient_metric_items, patient_files, patient_contents
+        )
 
-    for f in guideline_files:
-        if f["name"] in selected_filenames:
-            content = api_get_file_content(service, f["id"], f["mimeType"])
-            selected_guideline_text += f"\n\n---\nGUIDELINE FILE: {f['name']}\n{content}"
+    patient_text = budget.fit("patient_data", patient_items)
+
+    # ----------------------------------------------------------
+    # 3. GUIDELINE SELECTION (FILENAMES + PATIENT DATA)
+    # ----------------------------------------------------------
+    if GUIDELINE_MODE == "retrieval":
+        passages = await asyncio.to_thread(
+            guideline_index.search, user_query, context=patient_text
+        )
+        if not passages:
+            # Like the selector's first-files fallback: never send no guidelines
+            print("⚠️ No guideline passage matched; using each file's opening passage")
+            passages = guideline_index.leading_passages()
+
+        print("📌 Retrieved guideline passages:", [p["file_name"] for p in passages])
+
+        # Passages arrive best-first, so the weakest matches are trimmed first
+        selected_guideline_text = budget.fit("guidelines", [
+            (f"\n\n---\nGUIDELINE FILE: {p['file_name']} (excerpt)\n", p["text"])
+            for p in passages
+        ])
+
+    else:
+        filename_list = [f["name"] for f in guideline_files]
+
+        # Start downloading the guidelines this patient usually gets while
+        # the selector call is in flight
+        patient_key = patient_history_key(patient_files)
+        prefetch = {
+            f["name"]: submit_file_text(service, f)
+            for f in predict_guidelines(patient_key, guideline_files)
+        }
+        if prefetch:
+            print("⏩ Prefetching likely guidelines:", list(prefetch))
+
+        selected_filenames = await select_guidelines(
+            user_query, patient_files, patient_text, filename_list
+        )
+
+        print("📌 Selected guideline files:", selected_filenames)
+
+        # ----------------------------------------------------------
+        # 4. LOAD ONLY SELECTED GUIDELINE TEXT
+        # ----------------------------------------------------------
+        selected_files = [f for f in guideline_files if f["name"] in selected_filenames]
+        record_guideline_selection(patient_key, [f["name"] for f in selected_files])
+
+        # Drop prefetches that weren't chosen (a started download still
+        # finishes and lands in the text cache)
+        for name, future in prefetch.items():
+            if name not in selected_filenames:
+                future.cancel()
+
+        selected_contents = await asyncio.gather(*[
+            asyncio.wrap_future(prefetch[f["name"]]) if f["name"] in prefetch
+            else asyncio.wrap_future(submit_file_text(service, f))
+            for f in selected_files
+        ])
+
+        selected_guideline_text = budget.fit("guidelines", [
+            (f"\n\n---\nGUIDELINE FILE: {f['name']}\n", content)
+            for f, content in zip(selected_files, selected_contents)
+        ])
 
     # ----------------------------------------------------------
     # 5. Final prompt
     # ----------------------------------------------------------
-    user_message = f"""
+    # Blocks are laid out from most to least stable, with a cache breakpoint
+    # after each block that stays the same between questions, so repeat
+    # queries reuse the cached prefix. Retrieved passages depend on the
+    # question, so in retrieval mode they go after the patient data and
+    # carry no breakpoint; the selector's whole files are stabler and lead.
+    materials_intro = """
 Below are the materials you may use:
+"""
 
-=== PATIENT DATA ===
-{patient_text}
-
+    guideline_block = f"""
 === SELECTED ADA GUIDELINES ===
 {selected_guideline_text}
+"""
+
+    patient_block = f"""
+=== PATIENT DATA ===
+{patient_text}
+"""
 
+    question_block = f"""
 ---
 
 User's question: {user_query}
 """
 
+    if GUIDELINE_MODE == "retrieval":
+        content = [
+            cached_text_block(materials_intro + patient_block),
+            {"type": "text", "text": guideline_block},
+        ]
+    else:
+        content = [
+            cached_text_block(materials_intro + guideline_block),
+            cached_text_block(patient_block),
+        ]
+    content.append({"type": "text", "text": question_block})
+
+    return {
+        "system": [cached_text_block(system_prompt)],
+        "messages": [{"role": "user", "content": content}],
+    }
+
+
+async def agenerate_response(user_query, force=False):
+    """
+    Answers a question in one call. Preset questions are served from the
+    answer cache while their inputs are unchanged (force=True regenerates).
+    Identical concurrent questions are coalesced by jobs.JobExecutor; this
+    runs the pipeline unconditionally on a cache miss.
+    """
+    all_files = await asyncio.to_thread(get_drive_sync().list_files)
+    key = request_key(user_query, all_files)
+
+    if not force:
+        answer = await asyncio.to_thread(cached_answer, key)
+        if answer is not None:
+            return answer
+
+    final_request = await aprepare_final_request(user_query, all_files)
+
     print("🧠 Sending final request to Claude...")
 
-    final_resp = client.messages.create(
-        model="claude-sonnet-4-20250514",
-        max_tokens=2000,
-        system=system_prompt,
-        messages=[{"role": "user", "content": user_message}],
+    final_resp = await async_client.messages.create(
+        model=FINAL_MODEL,
+        max_tokens=FINAL_MAX_TOKENS,
+        **final_request,
     )
+    record_cache_usage(final_resp.usage)
+
+    answer = final_resp.content[0].text
+    await asyncio.to_thread(store_answer, key, answer)
+    return answer
+
+
+def prepare_final_request(user_query, all_files=None):
+    """Synchronous wrapper around aprepare_final_request()."""
+    return run_sync(aprepare_final_request(user_query, all_files))
+
+
+def generate_response(user_query, force=False):
+    """Synchronous wrapper around agenerate_response()."""
+    return run_sync(agenerate_response(user_query, force))
+
+
+def stream_final_response(final_request):
+    """Yield text deltas of the final answer as Claude produces them."""
+    print("🧠 Streaming final request to Claude...")
+
+    with client.messages.stream(
+        model=FINAL_MODEL,
+        max_tokens=FINAL_MAX_TOKENS,
+        **final_request,
+    ) as stream:
+        for text in stream.text_stream:
+            yield text
+
+        record_cache_usage(stream.get_final_message().usage)
+
 
-    return final_resp.content[0].text
+def generate_response_stream(user_query):
+    """Streaming variant of generate_response(): yields text deltas."""
+    yield from stream_final_response(prepare_final_request(user_query))